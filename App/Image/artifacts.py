@@ -0,0 +1,92 @@
+import itertools
+import os
+import threading
+import time
+import uuid
+
+import cv2
+
+
+class NullArtifactSink:
+    """Discards intermediate images; the default, so processing never pays for debug output."""
+
+    enabled = False
+
+    def save(self, name, image):
+        return None
+
+
+class MemoryArtifactSink:
+    """Keeps copies of intermediate images in memory, in the order they were saved."""
+
+    enabled = True
+
+    def __init__(self):
+        self.artifacts = []
+        self._lock = threading.Lock()
+
+    def save(self, name, image):
+        """
+        Store a copy of an intermediate image.
+
+        Args:
+            name (str): Name of the artifact, e.g. "Noise Removal".
+            image (numpy.ndarray): The image.
+
+        Returns:
+            int: Index of the artifact in self.artifacts.
+        """
+        with self._lock:
+            self.artifacts.append((name, image.copy()))
+            return len(self.artifacts) - 1
+
+    def get(self, name):
+        """Returns the most recent artifact with the given name, or None."""
+        with self._lock:
+            for artifact_name, image in reversed(self.artifacts):
+                if artifact_name == name:
+                    return image
+        return None
+
+    def clear(self):
+        with self._lock:
+            self.artifacts.clear()
+
+
+class DirectoryArtifactSink:
+    """
+    Writes intermediate images to a directory under unique names.
+
+    Names combine a per-sink prefix (time and a random id) with a running number, so several jobs
+    or processes can share one directory without overwriting each other's files.
+    """
+
+    enabled = True
+
+    def __init__(self, directory, extension=".png"):
+        self.directory = directory
+        self.extension = extension
+        self._prefix = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._counter = itertools.count()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, name, image):
+        """
+        Write an intermediate image.
+
+        Args:
+            name (str): Name of the artifact, used in the file name.
+            image (numpy.ndarray): The image.
+
+        Returns:
+            str: Path of the written file.
+        """
+        safe_name = "".join(char if char.isalnum() or char in "-_" else "_" for char in name)
+        path = os.path.join(self.directory, f"{self._prefix}-{next(self._counter):04d}-{safe_name}{self.extension}")
+        if not cv2.imwrite(path, image):
+            raise IOError(f"Could not write artifact '{path}'.")
+        return path
+
+
+# Shared no-op sink used when none is configured
+null_artifact_sink = NullArtifactSink()
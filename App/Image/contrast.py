@@ -1,6 +1,10 @@
+import threading
+
 import cv2
 import numpy as np
 
+from Image.artifacts import null_artifact_sink
+
 def adjust_brightness_contrast(image, alpha=1.0, beta=0):
     """
     Adjust brightness and contrast of an image.
@@ -27,21 +31,41 @@ def apply_gamma_correction(image, gamma=1.0):
     Returns:
     - gamma_corrected: The gamma-corrected image.
     """
-    inv_gamma = 1.0 / gamma
-    lut = np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)], dtype='uint8')
-    gamma_corrected = cv2.LUT(image, lut)
+    gamma_corrected = cv2.LUT(image, gamma_lut(gamma))
     return gamma_corrected
 
-def equalize_histogram(image):
+def gamma_lut(gamma=1.0):
+    """
+    Build the 256-entry lookup table used by apply_gamma_correction.
+
+    Parameters:
+    - gamma (float): Gamma value (>1 for brighter, <1 for darker).
+
+    Returns:
+    - lut: uint8 array of 256 entries.
+    """
+    inv_gamma = 1.0 / gamma
+    return np.array([((i / 255.0) ** inv_gamma) * 255 for i in range(256)], dtype='uint8')
+
+def equalize_histogram(image, method="global", clip_limit=2.0, tile_grid=(8, 8)):
     """
     Enhance the contrast of an image using histogram equalization.
 
     Parameters:
     - image: Input image (grayscale or BGR).
+    - method (str): "global" for one histogram over the whole image, "clahe" for tiled
+      adaptive equalization, which holds up better on high dynamic range shots.
+    - clip_limit (float): CLAHE contrast limit per tile.
+    - tile_grid (tuple): CLAHE grid as (columns, rows) of tiles.
 
     Returns:
     - equalized_image: The image with enhanced contrast.
     """
+    if method == "clahe":
+        return contrast_engine.equalize_in_place(image.copy(), method, clip_limit, tile_grid)
+    if method != "global":
+        raise ValueError("Invalid method specified. Choose 'global' or 'clahe'.")
+
     if len(image.shape) == 2:  # Grayscale image
         equalized_image = cv2.equalizeHist(image)
     else:  # Color image (BGR)
@@ -60,46 +84,181 @@ def equalize_histogram(image):
 
     return equalized_image
 
-def process_image(temp_file_path):
+class ContrastEngine:
     """
-    Process an image by applying brightness/contrast adjustment, gamma correction,
-    and histogram equalization sequentially.
+    Single-pass version of the brightness/contrast, gamma and equalization chain.
 
-    Parameters:
-    - temp_file_path: Path to the input image file.
+    Brightness/contrast and gamma are both pointwise, so they are composed into one 256-entry
+    lookup table (cached per parameter set) and applied in a single pass. Histogram
+    equalization then runs on that buffer in place. The output is identical to
+    adjust_brightness_contrast -> apply_gamma_correction -> equalize_histogram.
 
-    Returns:
-    - processed_images: A dictionary containing all processed images.
+    Equalization is either global or CLAHE on the luma. CLAHE objects are kept per parameter
+    set; they hold scratch buffers and are not thread-safe, so each thread gets its own.
+    OpenCV already spreads the CLAHE tiles over its worker threads.
     """
-    # Read the image
-    image = cv2.imread(temp_file_path)
 
-    if image is None:
-        raise FileNotFoundError(f"Image at '{temp_file_path}' could not be loaded. Check the file path.")
+    def __init__(self):
+        self._luts = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def lut(self, alpha=1.0, beta=0, gamma=1.0):
+        """
+        Return the combined lookup table for the given parameters, building it on first use.
+
+        Parameters:
+        - alpha (float): Contrast control.
+        - beta (int): Brightness control.
+        - gamma (float): Gamma value.
+
+        Returns:
+        - lut: Read-only uint8 array of 256 entries.
+        """
+        key = (float(alpha), float(beta), float(gamma))
+        lut = self._luts.get(key)
+        if lut is None:
+            # convertScaleAbs on every possible input value gives exactly its rounding and saturation
+            levels = np.arange(256, dtype=np.uint8).reshape(1, 256)
+            adjusted_levels = cv2.convertScaleAbs(levels, alpha=alpha, beta=beta).ravel()
+            lut = gamma_lut(gamma)[adjusted_levels]
+            lut.flags.writeable = False
+            with self._lock:
+                self._luts[key] = lut
+        return lut
+
+    def clahe(self, clip_limit=2.0, tile_grid=(8, 8)):
+        """
+        Return this thread's CLAHE object for the given parameters, creating it on first use.
+
+        Parameters:
+        - clip_limit (float): Contrast limit per tile.
+        - tile_grid (tuple): Grid as (columns, rows) of tiles.
+
+        Returns:
+        - clahe: cv2.CLAHE instance.
+        """
+        objects = getattr(self._local, "clahe", None)
+        if objects is None:
+            objects = self._local.clahe = {}
+        key = (float(clip_limit), tuple(int(size) for size in tile_grid))
+        clahe = objects.get(key)
+        if clahe is None:
+            clahe = objects[key] = cv2.createCLAHE(clipLimit=key[0], tileGridSize=key[1])
+        return clahe
+
+    def _equalize_channel(self, channel, method, clip_limit, tile_grid):
+        if method == "global":
+            return cv2.equalizeHist(channel, dst=channel)
+        if method == "clahe":
+            return self.clahe(clip_limit, tile_grid).apply(channel, dst=channel)
+        raise ValueError("Invalid method specified. Choose 'global' or 'clahe'.")
+
+    def equalize_in_place(self, image, method="global", clip_limit=2.0, tile_grid=(8, 8)):
+        """
+        Equalize the histogram of an image (of its luma for BGR images) without allocating a full-size copy.
+
+        Parameters:
+        - image: uint8 grayscale or BGR image; it is overwritten.
+        - method (str): "global" or "clahe".
+        - clip_limit (float): CLAHE contrast limit per tile.
+        - tile_grid (tuple): CLAHE grid as (columns, rows) of tiles.
+
+        Returns:
+        - image: The same array, equalized.
+        """
+        if image.ndim == 2:
+            return self._equalize_channel(image, method, clip_limit, tile_grid)
+
+        cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb, dst=image)
+        y_channel = cv2.extractChannel(image, 0)
+        self._equalize_channel(y_channel, method, clip_limit, tile_grid)
+        cv2.insertChannel(y_channel, image, 0)
+        cv2.cvtColor(image, cv2.COLOR_YCrCb2BGR, dst=image)
+        return image
+
+    def enhance(self, image, alpha=1.2, beta=25, gamma=1.5, out=None, equalization="global", clip_limit=2.0,
+                tile_grid=(8, 8)):
+        """
+        Apply brightness/contrast, gamma and histogram equalization in one pass plus an in-place equalization.
+
+        Parameters:
+        - image: Input image (grayscale or BGR); it is not modified.
+        - alpha (float): Contrast control.
+        - beta (int): Brightness control.
+        - gamma (float): Gamma value.
+        - out: Optional output array of the same shape and dtype as image.
+        - equalization (str): "global" or "clahe".
+        - clip_limit (float): CLAHE contrast limit per tile.
+        - tile_grid (tuple): CLAHE grid as (columns, rows) of tiles.
+
+        Returns:
+        - enhanced_image: The enhanced image (out, if given).
+        """
+        if out is None:
+            out = np.empty_like(image)
+        cv2.LUT(image, self.lut(alpha, beta, gamma), dst=out)
+        return self.equalize_in_place(out, equalization, clip_limit, tile_grid)
+
+
+# Shared engine, so the lookup tables are built once per process
+contrast_engine = ContrastEngine()
+
+def enhance_image(image, artifact_sink=null_artifact_sink, equalization="global", clip_limit=2.0, tile_grid=(8, 8)):
+    """
+    Apply brightness/contrast adjustment, gamma correction,
+    and histogram equalization sequentially to an in-memory image.
 
+    Parameters:
+    - image: Input image (BGR).
+    - artifact_sink: Where to keep the intermediate images (see Image.artifacts); nothing is kept by default.
+    - equalization (str): "global", or "clahe" for tiled adaptive equalization of the luma.
+    - clip_limit (float): CLAHE contrast limit per tile.
+    - tile_grid (tuple): CLAHE grid as (columns, rows) of tiles.
+
+    Returns:
+    - equalized_image: The enhanced image.
+    """
     # Apply adjustments
     alpha = 1.2  # Contrast control
     beta = 25    # Brightness control
-    adjusted_image = adjust_brightness_contrast(image, alpha=alpha, beta=beta)
-
     gamma = 1.5
-    gamma_corrected_image = apply_gamma_correction(adjusted_image, gamma=gamma)
 
-    equalized_image = equalize_histogram(gamma_corrected_image)
+    if not artifact_sink.enabled:
+        # Brightness/contrast and gamma run as one combined lookup table, then equalization in place
+        return contrast_engine.enhance(image, alpha=alpha, beta=beta, gamma=gamma, equalization=equalization,
+                                       clip_limit=clip_limit, tile_grid=tile_grid)
 
-    # Save and return results
-    processed_images = {
-        "adjusted": adjusted_image,
-        "gamma_corrected": gamma_corrected_image,
-        "equalized": equalized_image
-    }
-
-    for name, img in processed_images.items():
-        output_path = f"{name}_output.jpg"
-        cv2.imwrite(output_path, img)
+    # Brightness/contrast is only run on its own to keep its output; the combined table below
+    # still produces the same gamma corrected image
+    artifact_sink.save("adjusted", cv2.convertScaleAbs(image, alpha=alpha, beta=beta))
+    gamma_corrected_image = cv2.LUT(image, contrast_engine.lut(alpha, beta, gamma))
+    artifact_sink.save("gamma_corrected", gamma_corrected_image)
+    equalized_image = contrast_engine.equalize_in_place(gamma_corrected_image.copy(), equalization, clip_limit,
+                                                        tile_grid)
+    artifact_sink.save("equalized", equalized_image)
 
     return equalized_image
 
+def process_image(temp_file_path, artifact_sink=null_artifact_sink):
+    """
+    Process an image file by applying brightness/contrast adjustment, gamma correction,
+    and histogram equalization sequentially.
+
+    Parameters:
+    - temp_file_path: Path to the input image file.
+    - artifact_sink: Where to keep the intermediate images; nothing is kept by default.
+
+    Returns:
+    - equalized_image: The enhanced image.
+    """
+    # Read the image
+    image = cv2.imread(temp_file_path)
+
+    if image is None:
+        raise FileNotFoundError(f"Image at '{temp_file_path}' could not be loaded. Check the file path.")
+
+    return enhance_image(image, artifact_sink)
 
 
 
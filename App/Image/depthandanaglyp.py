@@ -1,60 +1,209 @@
 import cv2
 import numpy as np
-from transformers import DPTForDepthEstimation, DPTFeatureExtractor
-from PIL import Image
-import torch
+import os
 
-from transformers import DPTForDepthEstimation, DPTFeatureExtractor
-from PIL import Image
-import numpy as np
-import cv2
-import torch
+# torch and PIL (and transformers, through the model registry) are imported on first use
+# so that importing this module doesn't slow down application startup
+
+from Image.modelregistry import depth_model_registry, DEFAULT_DEPTH_MODEL
 
-def generate_depth_map(image_path):
+def generate_depth_map(image_path, model_name=DEFAULT_DEPTH_MODEL, backend=None):
     """
     Generate a depth map using the DPT model and optionally save it.
 
     Args:
-        image_path (str): Path to the input image.
-        save_path (str, optional): Path to save the generated depth map.
-        save (bool): Whether to save the depth map.
+        image_path (str or numpy.ndarray): Path to the input image, or the BGR image itself.
+        model_name (str): DPT model to use; it is loaded once per process by the model registry.
+        backend (str, optional): "eager", "torchscript", "onnx" or "int8"; defaults to the registry's default_backend.
 
     Returns:
         numpy.ndarray: The generated depth map.
     """
-    # Load model and feature extractor
-    model = DPTForDepthEstimation.from_pretrained("Intel/dpt-large")
-    feature_extractor = DPTFeatureExtractor.from_pretrained("Intel/dpt-large")
+    # Fetch the warm backend and feature extractor (loaded on first use only)
+    depth_backend, feature_extractor = depth_model_registry.get_backend(model_name, backend)
 
     # Load and preprocess the image
-    image = Image.open(image_path).convert("RGB")
+    image = _load_rgb_image(image_path)
     inputs = feature_extractor(images=image, return_tensors="pt")
 
     # Predict depth
-    with torch.no_grad():
-        outputs = model(**inputs)
-        predicted_depth = outputs.predicted_depth[0].numpy()
+    predicted_depth = depth_backend.predict(inputs["pixel_values"])[0]
 
-    # Normalize the depth map
+    return normalize_depth(predicted_depth)
+
+
+def normalize_depth(predicted_depth):
+    """
+    Normalize a raw DPT prediction to an 8-bit depth map.
+
+    Args:
+        predicted_depth (numpy.ndarray): Raw depth predicted by the model.
+
+    Returns:
+        numpy.ndarray: The depth map scaled to 0-255.
+    """
     normalized_depth = cv2.normalize(predicted_depth, None, 0, 255, cv2.NORM_MINMAX)
     depth_map = normalized_depth.astype(np.uint8)
 
     return depth_map
 
 
-def create_anaglyph(image, depth_map, shift=15):
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def _load_rgb_image(source):
+    """Returns a PIL RGB image from a file path or a BGR numpy array."""
+    from PIL import Image
+
+    if isinstance(source, np.ndarray):
+        if source.ndim == 2:
+            return Image.fromarray(cv2.cvtColor(source, cv2.COLOR_GRAY2RGB))
+        return Image.fromarray(cv2.cvtColor(source, cv2.COLOR_BGR2RGB))
+    return Image.open(source).convert("RGB")
+
+
+def _iter_sources(paths_or_arrays):
+    """Expands a directory path into its image files; other inputs are passed through."""
+    if isinstance(paths_or_arrays, str):
+        if not os.path.isdir(paths_or_arrays):
+            raise FileNotFoundError(f"Directory '{paths_or_arrays}' could not be found.")
+        for name in sorted(os.listdir(paths_or_arrays)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(paths_or_arrays, name)
+        return
+
+    yield from paths_or_arrays
+
+
+def generate_depth_maps(paths_or_arrays, batch_size=4, model_name=DEFAULT_DEPTH_MODEL, window=4, backend=None):
     """
-    Creates an anaglyph (red-cyan) 3D image.
+    Generate depth maps for many images, running the DPT model in mini-batches.
+
+    Inputs are consumed in windows of batch_size * window images. Inside a window,
+    images are grouped by their preprocessed resolution so each forward pass gets a
+    stacked batch, and the depth maps are yielded in input order. Only one window
+    is held in memory at a time.
 
     Args:
-        image (numpy.ndarray): Input image.
-        depth_map (numpy.ndarray): Depth map corresponding to the input image.
+        paths_or_arrays: A directory path, or an iterable of image paths and/or BGR numpy arrays.
+        batch_size (int): Maximum number of images per forward pass.
+        model_name (str): DPT model to use; it is shared through the model registry.
+        window (int): Number of batches worth of images to read ahead for grouping.
+        backend (str, optional): "eager", "torchscript", "onnx" or "int8"; defaults to the registry's default_backend.
+
+    Yields:
+        numpy.ndarray: The depth map of each input, in input order.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+
+    import torch
+
+    depth_backend, feature_extractor = depth_model_registry.get_backend(model_name, backend)
+    window_size = batch_size * max(1, window)
+
+    sources = _iter_sources(paths_or_arrays)
+    while True:
+        pending = []
+        for source in sources:
+            pending.append(source)
+            if len(pending) == window_size:
+                break
+        if not pending:
+            return
+
+        # Preprocess each image and group them by tensor shape
+        groups = {}
+        for index, source in enumerate(pending):
+            pixel_values = feature_extractor(images=_load_rgb_image(source), return_tensors="pt")["pixel_values"]
+            groups.setdefault(tuple(pixel_values.shape[1:]), []).append((index, pixel_values))
+        pending = None
+
+        depth_maps = [None] * sum(len(group) for group in groups.values())
+        for group in groups.values():
+            for start in range(0, len(group), batch_size):
+                batch = group[start:start + batch_size]
+                predicted_depth = depth_backend.predict(torch.cat([pixel_values for _, pixel_values in batch]))
+                for (index, _), depth in zip(batch, predicted_depth):
+                    depth_maps[index] = normalize_depth(depth)
+        groups = None
+
+        yield from depth_maps
+
+        if len(depth_maps) < window_size:
+            return
+
+
+def compute_shift_map(depth_map, shift):
+    """
+    Compute the per-pixel horizontal disparity for a prepared depth map.
+
+    Args:
+        depth_map (numpy.ndarray): 8-bit depth map with the same size as the image.
         shift (int): Maximum pixel shift for the anaglyph effect.
 
     Returns:
-        numpy.ndarray: Anaglyph image.
+        numpy.ndarray: Integer shift for every pixel (truncated like int()).
+    """
+    return (shift * depth_map.astype(np.float64) / 255).astype(np.intp)
+
+
+def warp_stereo_pair(image, shift_map, method="remap"):
+    """
+    Shift every pixel of the image horizontally to build the left and right views.
+
+    Pixels whose source column falls outside the image are left black.
+
+    Args:
+        image (numpy.ndarray): Input image.
+        shift_map (numpy.ndarray): Per-pixel shift from compute_shift_map (non-negative).
+        method (str): "remap" for cv2.remap with nearest sampling, "index" for a NumPy gather.
+
+    Returns:
+        tuple: (left_image, right_image)
+    """
+    rows, cols = shift_map.shape
+    col_coords = np.arange(cols, dtype=np.intp)[np.newaxis, :]
+    left_x = col_coords + shift_map
+    right_x = col_coords - shift_map
+
+    if method == "remap":
+        # Integer maps sample exactly under INTER_NEAREST, out-of-range columns hit the zero border
+        row_coords = np.broadcast_to(np.arange(rows, dtype=np.float32)[:, np.newaxis], (rows, cols))
+        left_image = cv2.remap(image, left_x.astype(np.float32), row_coords, cv2.INTER_NEAREST,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        right_image = cv2.remap(image, right_x.astype(np.float32), row_coords, cv2.INTER_NEAREST,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    elif method == "index":
+        row_coords = np.arange(rows, dtype=np.intp)[:, np.newaxis]
+        left_valid = left_x < cols
+        right_valid = right_x >= 0
+
+        left_image = image[row_coords, np.where(left_valid, left_x, 0)]
+        left_image[~left_valid] = 0
+        right_image = image[row_coords, np.where(right_valid, right_x, 0)]
+        right_image[~right_valid] = 0
+    else:
+        raise ValueError("Invalid method specified. Choose 'index' or 'remap'.")
+
+    return left_image, right_image
+
+
+def prepare_depth_map(depth_map, image_shape):
     """
-    rows, cols, _ = image.shape
+    Resize, smooth and stretch a depth map for the anaglyph warp.
+
+    The result depends only on the depth map and the image size, so it can be kept and reused
+    while the shift or gamma of the anaglyph are changed.
+
+    Args:
+        depth_map (numpy.ndarray): Depth map from generate_depth_map.
+        image_shape (tuple): Shape of the image the anaglyph is made from.
+
+    Returns:
+        numpy.ndarray: uint8 depth map with the image's height and width.
+    """
+    rows, cols = image_shape[:2]
 
     # Resize depth map to match the original image dimensions
     depth_map = cv2.resize(depth_map, (cols, rows))
@@ -63,53 +212,80 @@ def create_anaglyph(image, depth_map, shift=15):
     depth_map = cv2.bilateralFilter(depth_map, d=9, sigmaColor=75, sigmaSpace=75)
     depth_map = cv2.normalize(depth_map, None, 0, 255, cv2.NORM_MINMAX)
     depth_map = np.power(depth_map / 255.0, 0.5) * 255
-    depth_map = depth_map.astype(np.uint8)
+    return depth_map.astype(np.uint8)
 
-    # Create left and right shifted images
-    left_image = np.zeros_like(image)
-    right_image = np.zeros_like(image)
 
-    for row in range(rows):
-        for col in range(cols):
-            shift_value = int(shift * depth_map[row, col] / 255)
-            if col + shift_value < cols:
-                left_image[row, col] = image[row, col + shift_value]
-            if col - shift_value >= 0:
-                right_image[row, col] = image[row, col - shift_value]
+def compose_anaglyph(image, prepared_depth_map, shift=15, gamma=1.2, method="remap"):
+    """
+    Warps the image by a prepared depth map and combines the views into a red-cyan anaglyph.
+
+    Args:
+        image (numpy.ndarray): Input image.
+        prepared_depth_map (numpy.ndarray): Output of prepare_depth_map for this image.
+        shift (int): Maximum pixel shift for the anaglyph effect.
+        gamma (float): Gamma applied to the combined image.
+        method (str): Warping backend passed to warp_stereo_pair ("index" or "remap").
+
+    Returns:
+        numpy.ndarray: Anaglyph image.
+    """
+    # Create left and right shifted images
+    shift_map = compute_shift_map(prepared_depth_map, shift)
+    left_image, right_image = warp_stereo_pair(image, shift_map, method=method)
 
     # Combine left and right images into an anaglyph
     anaglyph = np.zeros_like(image)
-    weight = depth_map / 255.0
+    weight = prepared_depth_map / 255.0
     anaglyph[:, :, 0] = (1 - weight) * left_image[:, :, 0] + weight * right_image[:, :, 0]  # Red
     anaglyph[:, :, 1] = right_image[:, :, 1] * (1 - weight)  # Cyan (green & blue components)
     anaglyph[:, :, 2] = right_image[:, :, 2] * (1 - weight)
 
     # Apply gamma correction for better lighting
-    gamma = 1.2
     anaglyph = np.power(anaglyph / 255.0, gamma) * 255
     anaglyph = anaglyph.astype(np.uint8)
 
     return anaglyph
 
 
-def generate_anaglyph(image_path, depth_map):
+def create_anaglyph(image, depth_map, shift=15, method="remap", gamma=1.2):
+    """
+    Creates an anaglyph (red-cyan) 3D image.
+
+    Args:
+        image (numpy.ndarray): Input image.
+        depth_map (numpy.ndarray): Depth map corresponding to the input image.
+        shift (int): Maximum pixel shift for the anaglyph effect.
+        method (str): Warping backend passed to warp_stereo_pair ("index" or "remap").
+        gamma (float): Gamma applied to the combined image.
+
+    Returns:
+        numpy.ndarray: Anaglyph image.
+    """
+    prepared_depth_map = prepare_depth_map(depth_map, image.shape)
+    return compose_anaglyph(image, prepared_depth_map, shift=shift, gamma=gamma, method=method)
+
+
+def generate_anaglyph(image_path, depth_map, shift=15, gamma=1.2):
     """
     Generate a red-cyan anaglyph image using the input image and its depth map and optionally save it.
 
+    Pass the image itself together with a depth map that was computed earlier to skip both
+    reading the file and running the depth model.
+
     Args:
-        image_path (str): Path to the input image.
+        image_path (str or numpy.ndarray): Path to the input image, or the BGR image itself.
         depth_map (numpy.ndarray): Depth map of the input image.
-        save_path (str, optional): Path to save the output anaglyph image.
-        save (bool): Whether to save the anaglyph image.
+        shift (int): Maximum pixel shift for the anaglyph effect.
+        gamma (float): Gamma applied to the combined image.
     """
     # Load the input image
-    image = cv2.imread(image_path)
+    image = image_path if isinstance(image_path, np.ndarray) else cv2.imread(image_path)
 
     if image is None:
         raise FileNotFoundError("Input image not found.")
 
     # Create the anaglyph image
-    anaglyph = create_anaglyph(image, depth_map)
+    anaglyph = create_anaglyph(image, depth_map, shift=shift, gamma=gamma)
 
     return anaglyph
 
@@ -0,0 +1,262 @@
+import hashlib
+import os
+import threading
+
+from instrumentation import span
+
+# torch is imported on first use and onnxruntime only by the ONNX backend, so neither is
+# needed to import this module
+
+DEPTH_BACKENDS = ("eager", "torchscript", "onnx", "int8")
+
+# Exported graphs are kept here between runs; one file per model and input resolution
+DEPTH_EXPORT_DIR = os.environ.get(
+    "DEPTH_EXPORT_DIR", os.path.join(os.path.expanduser("~"), ".cache", "anaglyph3d", "depth"))
+
+
+def _export_stem(model_name, shape, fingerprint):
+    """File name (without extension) of an exported graph for a model, input height/width and fingerprint."""
+    safe_name = "".join(char if char.isalnum() or char in "-_." else "_" for char in model_name.strip("/\\"))
+    return f"{safe_name}_{shape[0]}x{shape[1]}_{fingerprint}"
+
+
+def _model_fingerprint(model, library_versions):
+    """
+    Short hash of a model's weights and the library versions that export and run its graph.
+
+    Saved graphs are named with it, so retrained weights or a library upgrade export a new graph
+    instead of loading a stale one.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr(sorted(library_versions.items())).encode())
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(str((tuple(tensor.shape), str(tensor.dtype))).encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _depth_only_module(model):
+    """Wraps a DPT model in a module that takes pixel_values and returns only predicted_depth, for export."""
+    import torch
+
+    class PredictedDepth(torch.nn.Module):
+        def __init__(self, depth_model):
+            super().__init__()
+            self.depth_model = depth_model
+
+        def forward(self, pixel_values):
+            return self.depth_model(pixel_values=pixel_values).predicted_depth
+
+    return PredictedDepth(model).eval()
+
+
+class EagerDepthBackend:
+    """Runs the DPT model as a regular PyTorch module."""
+
+    name = "eager"
+
+    def __init__(self, model, model_name, export_dir=None):
+        self.model = model
+        self.model_name = model_name
+
+    def predict(self, pixel_values):
+        """
+        Predict raw depth for a batch of preprocessed images.
+
+        Args:
+            pixel_values (torch.Tensor): Batch from the feature extractor, shape (N, 3, H, W).
+
+        Returns:
+            numpy.ndarray: Raw predicted depth, shape (N, H, W).
+        """
+        import torch
+
+        with torch.inference_mode():
+            return self.model(pixel_values=pixel_values).predicted_depth.numpy()
+
+
+class DynamicInt8DepthBackend(EagerDepthBackend):
+    """
+    Runs a copy of the DPT model whose linear layers are dynamically quantized to int8.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up the
+    transformer encoder on CPU at the cost of a slightly less accurate depth map. The fp32 model
+    stays loaded in the registry for jobs that need full fidelity.
+    """
+
+    name = "int8"
+
+    def __init__(self, model, model_name, export_dir=None):
+        import copy
+
+        import torch
+
+        quantized_model = torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(quantized_model.eval(), model_name)
+
+
+class _ExportedDepthBackend:
+    """
+    Base class of the backends that run an exported graph.
+
+    The graph is traced for a fixed input height and width (the batch size stays free), so one
+    graph is exported per resolution and kept in memory and in export_dir. Files in export_dir are
+    also keyed by a fingerprint of the weights and library versions.
+    """
+
+    name = None
+    extension = None
+
+    def __init__(self, model, model_name, export_dir=DEPTH_EXPORT_DIR):
+        self.model = model
+        self.model_name = model_name
+        self.export_dir = export_dir
+        self._graphs = {}
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _library_versions(self):
+        import torch
+
+        return {"torch": torch.__version__}
+
+    def _graph_for(self, pixel_values):
+        shape = tuple(pixel_values.shape[2:])
+        graph = self._graphs.get(shape)
+        if graph is not None:
+            return graph
+
+        with self._lock:
+            graph = self._graphs.get(shape)
+            if graph is None:
+                path = None
+                if self.export_dir is not None:
+                    os.makedirs(self.export_dir, exist_ok=True)
+                    if self._fingerprint is None:
+                        self._fingerprint = _model_fingerprint(self.model, self._library_versions())
+                    path = os.path.join(self.export_dir,
+                                        _export_stem(self.model_name, shape, self._fingerprint) + self.extension)
+                if path is None or not os.path.exists(path):
+                    with span(f"model.export.{self.name}"):
+                        path = self._export(pixel_values[:1], path)
+                with span(f"model.load.{self.name}"):
+                    graph = self._load(path)
+                self._graphs[shape] = graph
+        return graph
+
+    def predict(self, pixel_values):
+        """
+        Predict raw depth for a batch of preprocessed images, exporting the graph on first use.
+
+        Args:
+            pixel_values (torch.Tensor): Batch from the feature extractor, shape (N, 3, H, W).
+
+        Returns:
+            numpy.ndarray: Raw predicted depth, shape (N, H, W).
+        """
+        return self._run(self._graph_for(pixel_values), pixel_values)
+
+
+class TorchScriptDepthBackend(_ExportedDepthBackend):
+    """Runs a traced and frozen TorchScript version of the DPT model."""
+
+    name = "torchscript"
+    extension = ".pt"
+
+    def _export(self, example, path):
+        import torch
+
+        with torch.inference_mode(False), torch.no_grad():
+            graph = torch.jit.freeze(torch.jit.trace(_depth_only_module(self.model), example, check_trace=False))
+        if path is None:
+            return graph
+        # Save under a temporary name so a concurrent process never loads a partial file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        torch.jit.save(graph, temp_path)
+        os.replace(temp_path, path)
+        return path
+
+    def _load(self, path_or_graph):
+        import torch
+
+        if not isinstance(path_or_graph, str):
+            return path_or_graph
+        return torch.jit.load(path_or_graph, map_location="cpu").eval()
+
+    def _run(self, graph, pixel_values):
+        import torch
+
+        with torch.inference_mode():
+            return graph(pixel_values).numpy()
+
+
+class OnnxDepthBackend(_ExportedDepthBackend):
+    """Runs an ONNX export of the DPT model with ONNX Runtime on the CPU."""
+
+    name = "onnx"
+    extension = ".onnx"
+
+    def __init__(self, model, model_name, export_dir=DEPTH_EXPORT_DIR):
+        # Fail early with a clear message instead of after a slow export
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The onnx depth backend needs the onnxruntime package.") from e
+        if export_dir is None:
+            raise ValueError("The onnx depth backend needs an export directory.")
+        super().__init__(model, model_name, export_dir)
+
+    def _library_versions(self):
+        import onnxruntime
+
+        return dict(super()._library_versions(), onnxruntime=onnxruntime.__version__)
+
+    def _export(self, example, path):
+        import torch
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.inference_mode(False), torch.no_grad():
+            torch.onnx.export(_depth_only_module(self.model), (example,), temp_path,
+                              input_names=["pixel_values"], output_names=["predicted_depth"],
+                              dynamic_axes={"pixel_values": {0: "batch"}, "predicted_depth": {0: "batch"}},
+                              opset_version=17, dynamo=False)
+        os.replace(temp_path, path)
+        return path
+
+    def _load(self, path):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def _run(self, session, pixel_values):
+        return session.run(None, {"pixel_values": pixel_values.numpy()})[0]
+
+
+_BACKEND_CLASSES = {
+    "eager": EagerDepthBackend,
+    "torchscript": TorchScriptDepthBackend,
+    "onnx": OnnxDepthBackend,
+    "int8": DynamicInt8DepthBackend,
+}
+
+
+def create_depth_backend(backend, model, model_name, export_dir=DEPTH_EXPORT_DIR):
+    """
+    Build a depth backend around a loaded DPT model.
+
+    Args:
+        backend (str): One of DEPTH_BACKENDS.
+        model (DPTForDepthEstimation): The eager model, used directly or for export.
+        model_name (str): Name of the model, used to name exported files.
+        export_dir (str, optional): Directory for exported graphs.
+
+    Returns:
+        The backend; its predict(pixel_values) returns the raw depth as a numpy array.
+    """
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Unknown depth backend '{backend}'. Choose one of {', '.join(DEPTH_BACKENDS)}.")
+    return _BACKEND_CLASSES[backend](model, model_name, export_dir)
@@ -0,0 +1,128 @@
+import os
+import threading
+
+from instrumentation import span
+
+DEFAULT_DEPTH_MODEL = "Intel/dpt-large"
+
+# Depth backend used when none is requested ("eager", "torchscript", "onnx" or "int8"), see Image.depthbackends
+DEFAULT_DEPTH_BACKEND = os.environ.get("DEPTH_BACKEND", "eager")
+
+
+class DepthModelRegistry:
+    """
+    A process-wide registry that keeps DPT depth models resident in memory.
+
+    Models are loaded lazily the first time they are requested and are then
+    shared by every caller (image, video and live paths) until they are
+    explicitly unloaded.
+    """
+
+    def __init__(self, default_backend=DEFAULT_DEPTH_BACKEND):
+        self._models = {}
+        self._backends = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        # Can be changed at runtime; affects calls that don't name a backend
+        self.default_backend = default_backend
+
+    def get(self, model_name=DEFAULT_DEPTH_MODEL):
+        """
+        Return the model and feature extractor for the given name, loading them on first use.
+
+        Args:
+            model_name (str): Hugging Face identifier or local path of the DPT model.
+
+        Returns:
+            tuple: (DPTForDepthEstimation, DPTFeatureExtractor)
+        """
+        entry = self._models.get(model_name)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        # Only one thread loads a given model; others wait for it instead of loading a second copy
+        with load_lock:
+            entry = self._models.get(model_name)
+            if entry is None:
+                # Deferred so the GUI can start without paying the transformers/torch import
+                from transformers import DPTForDepthEstimation, DPTFeatureExtractor
+
+                with span("model.load.depth"):
+                    model = DPTForDepthEstimation.from_pretrained(model_name)
+                    model.eval()
+                    feature_extractor = DPTFeatureExtractor.from_pretrained(model_name)
+                entry = (model, feature_extractor)
+                with self._lock:
+                    self._models[model_name] = entry
+
+        return entry
+
+    def get_backend(self, model_name=DEFAULT_DEPTH_MODEL, backend=None):
+        """
+        Return the depth backend and feature extractor for a model, creating the backend on first use.
+
+        Args:
+            model_name (str): Hugging Face identifier or local path of the DPT model.
+            backend (str, optional): "eager", "torchscript", "onnx" or "int8"; defaults to default_backend.
+
+        Returns:
+            tuple: (depth backend, DPTFeatureExtractor)
+        """
+        backend = backend or self.default_backend
+        key = (model_name, backend)
+        entry = self._backends.get(key)
+        if entry is not None:
+            return entry
+
+        model, feature_extractor = self.get(model_name)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            entry = self._backends.get(key)
+            if entry is None:
+                from Image.depthbackends import create_depth_backend
+
+                with span(f"model.load.depth_backend.{backend}"):
+                    entry = (create_depth_backend(backend, model, model_name), feature_extractor)
+                with self._lock:
+                    self._backends[key] = entry
+
+        return entry
+
+    def is_loaded(self, model_name=DEFAULT_DEPTH_MODEL):
+        """Returns True if the model is currently resident."""
+        return model_name in self._models
+
+    def loaded_models(self):
+        """Returns the names of all resident models."""
+        with self._lock:
+            return list(self._models)
+
+    def unload(self, model_name=DEFAULT_DEPTH_MODEL):
+        """
+        Evict a model from the registry so its memory can be reclaimed.
+
+        Args:
+            model_name (str): Name of the model to evict.
+
+        Returns:
+            bool: True if the model was resident and has been evicted.
+        """
+        with self._lock:
+            for key in [key for key in self._backends if key[0] == model_name]:
+                del self._backends[key]
+            return self._models.pop(model_name, None) is not None
+
+    def clear(self):
+        """Evicts every resident model."""
+        with self._lock:
+            self._models.clear()
+            self._backends.clear()
+
+
+# Shared instance used by generate_depth_map and the video/live paths
+depth_model_registry = DepthModelRegistry()
@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-from skimage.restoration import denoise_wavelet
 
 
 def remove_noise(image, method="bilateral"):
@@ -20,14 +19,36 @@ def remove_noise(image, method="bilateral"):
         # Apply bilateral filter to remove noise while preserving edges
         denoised_image = cv2.bilateralFilter(image, d=9, sigmaColor=75, sigmaSpace=75)
     elif method == "wavelet":
-        # Use wavelet denoising (requires scikit-image)
-        denoised_image = denoise_wavelet(image, multichannel=True, rescale_sigma=True)
+        # Use wavelet denoising (requires scikit-image, imported here because it is slow to load)
+        from skimage.restoration import denoise_wavelet
+
+        denoised_image = denoise_wavelet(image, channel_axis=-1, rescale_sigma=True)
         denoised_image = (denoised_image * 255).astype(np.uint8)  # Convert back to 8-bit
     else:
         raise ValueError("Invalid method specified. Choose 'bilateral' or 'wavelet'.")
 
     return denoised_image
 
+def denoise_image(image, method="bilateral"):
+    """
+    Removes noise from an in-memory BGR image (as loaded by OpenCV).
+
+    Args:
+        image (numpy.ndarray): The input BGR image.
+        method (str): Method to use for noise removal. Options: "bilateral", "wavelet".
+
+    Returns:
+        numpy.ndarray: The denoised BGR image.
+    """
+    # Convert the image to RGB (OpenCV loads images in BGR format)
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    # Call the remove_noise function
+    denoised_image = remove_noise(image_rgb, method=method)
+    denoised_image = cv2.cvtColor(denoised_image, cv2.COLOR_BGR2RGB)
+
+    return denoised_image
+
 def process_temp_image(temp_file_path, method="bilateral", save=False, save_path=None):
     """
     Reads an image from a temporary file, removes noise using the specified method,
@@ -48,12 +69,7 @@ def process_temp_image(temp_file_path, method="bilateral", save=False, save_path
     if image is None:
         raise FileNotFoundError(f"The file at {temp_file_path} could not be read.")
 
-    # Convert the image to RGB (OpenCV loads images in BGR format)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    # Call the remove_noise function
-    denoised_image = remove_noise(image_rgb, method=method)
-    denoised_image = cv2.cvtColor(denoised_image, cv2.COLOR_BGR2RGB)
+    denoised_image = denoise_image(image, method=method)
 
     if save:
         if save_path is None:
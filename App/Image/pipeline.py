@@ -0,0 +1,307 @@
+import threading
+
+from Image.contrast import enhance_image
+from Image.depthandanaglyp import generate_depth_map, generate_anaglyph, prepare_depth_map, compose_anaglyph
+from Image.noisehandling import denoise_image
+from Image.upscale import DEFAULT_TILE_SIZE, superres_engine
+from Image.modelregistry import depth_model_registry, DEFAULT_DEPTH_MODEL
+from Image.resultcache import hash_array, stage_key
+from Image.artifacts import null_artifact_sink
+from instrumentation import span
+
+
+def cached_depth_map(image, cache=None, backend=None):
+    """
+    Generate the depth map of an in-memory image, reusing a cached one for the same pixels.
+
+    Args:
+        image (numpy.ndarray): The input BGR image.
+        cache (ResultCache, optional): Cache for the depth map.
+        backend (str, optional): Depth backend, e.g. "int8" for faster, slightly less accurate maps.
+
+    Returns:
+        numpy.ndarray: Depth map.
+    """
+    if cache is None:
+        return generate_depth_map(image, backend=backend)
+
+    # Backends differ in the last bits of the prediction, so each keeps its own depth maps
+    depth_key = stage_key(hash_array(image), "Depth Map",
+                          {"model": DEFAULT_DEPTH_MODEL, "backend": backend or depth_model_registry.default_backend})
+    depth_map = cache.get(depth_key)
+    if depth_map is None:
+        depth_map = generate_depth_map(image, backend=backend)
+        cache.put(depth_key, depth_map)
+    return depth_map
+
+
+def depth_and_anaglyph(image, cache=None, shift=15, gamma=1.2, backend=None):
+    """
+    Generate a depth map for an in-memory image and turn it into a red-cyan anaglyph.
+
+    Args:
+        image (numpy.ndarray): The input BGR image.
+        cache (ResultCache, optional): Cache for the depth map, so the anaglyph can be redone
+            without running the depth model again.
+        shift (int): Maximum pixel shift for the anaglyph effect.
+        gamma (float): Gamma applied to the anaglyph.
+        backend (str, optional): Depth backend; defaults to the registry's default_backend.
+
+    Returns:
+        numpy.ndarray: Anaglyph image.
+    """
+    return generate_anaglyph(image, cached_depth_map(image, cache, backend), shift=shift, gamma=gamma)
+
+
+class DepthSession:
+    """
+    Keeps the image and depth map of the last depth stage, so the anaglyph can be redone with
+    another shift or gamma by rerunning only the warp.
+    """
+
+    def __init__(self, shift=15, gamma=1.2):
+        self.shift = shift
+        self.gamma = gamma
+        # (image, depth_map, prepared_depth_map), replaced as a whole so readers never see a mix
+        self._state = None
+
+    def has_depth(self):
+        return self._state is not None
+
+    @property
+    def depth_map(self):
+        """The raw depth map, or None before the first depth stage."""
+        return self._state[1] if self._state is not None else None
+
+    def set_depth(self, image, depth_map):
+        """
+        Store an image and its precomputed depth map.
+
+        Args:
+            image (numpy.ndarray): The BGR image the anaglyph is made from.
+            depth_map (numpy.ndarray): Its depth map, e.g. from generate_depth_map.
+        """
+        self._state = (image, depth_map, prepare_depth_map(depth_map, image.shape))
+
+    def process(self, image, cache=None, backend=None):
+        """Pipeline stage: computes (or fetches) the depth map of image, keeps it and returns the anaglyph."""
+        self.set_depth(image, cached_depth_map(image, cache, backend))
+        return self.anaglyph()
+
+    def anaglyph(self, shift=None, gamma=None):
+        """
+        Rebuild the anaglyph from the stored depth map.
+
+        Args:
+            shift (int, optional): New maximum pixel shift; keeps the current one if None.
+            gamma (float, optional): New gamma; keeps the current one if None.
+
+        Returns:
+            numpy.ndarray: Anaglyph image.
+        """
+        if self._state is None:
+            raise ValueError("No depth map has been computed yet.")
+        if shift is not None:
+            self.shift = shift
+        if gamma is not None:
+            self.gamma = gamma
+        image, _, prepared_depth_map = self._state
+        return compose_anaglyph(image, prepared_depth_map, shift=self.shift, gamma=self.gamma)
+
+
+# Images with a longer edge than this are upscaled tile by tile to bound peak memory
+TILED_UPSCALE_THRESHOLD = 1024
+
+
+def upscale_stage(image, factor, tile_size=DEFAULT_TILE_SIZE, overlap=16):
+    """Upscales an in-memory image with the bundled LapSRN model for the given factor."""
+    if max(image.shape[:2]) > TILED_UPSCALE_THRESHOLD:
+        return superres_engine.upscale_tiled(image, factor, tile_size=tile_size, overlap=overlap)
+    return superres_engine.upscale(image, factor)
+
+
+class PipelineCancelled(Exception):
+    """Raised by ImagePipeline.run when the run was cancelled between stages."""
+
+
+class ImagePipeline:
+    """
+    An ordered list of image processing stages that pass numpy arrays to each other in memory.
+
+    Nothing is written to disk; saving the result is left to the caller. With a cache, each stage
+    output is stored under a key chained from the input pixels and the stages and parameters that
+    produced it, so re-running with one option changed only recomputes the stages from that point on.
+    Each stage output is also handed to the artifact sink, which by default discards it; stages
+    added with pass_artifact_sink also get the sink for their own intermediate images.
+    """
+
+    def __init__(self, cache=None, artifact_sink=null_artifact_sink):
+        self.stages = []
+        self.cache = cache
+        self.artifact_sink = artifact_sink
+
+    def add_stage(self, name, func, pass_cache=False, pass_artifact_sink=False, **params):
+        """
+        Append a stage to the pipeline.
+
+        Args:
+            name (str): Name of the stage (used for progress and error reporting).
+            func (callable): Function taking an image as first argument and returning the processed image.
+            pass_cache (bool): Pass the pipeline cache to func as the cache keyword argument instead of
+                caching the stage output, for stages that cache their expensive part themselves.
+            pass_artifact_sink (bool): Pass the pipeline's artifact sink to func as the artifact_sink
+                keyword argument. It is not part of the cache key, and while the sink is enabled the
+                stage always runs so its intermediate images are saved.
+            **params: Extra keyword arguments passed to func.
+
+        Returns:
+            ImagePipeline: The pipeline itself, so calls can be chained.
+        """
+        self.stages.append((name, func, params, pass_cache, pass_artifact_sink))
+        return self
+
+    def run(self, image, on_stage_done=None, on_stage_error=None, on_stage_start=None, should_cancel=None):
+        """
+        Run every stage in order on the given image.
+
+        Args:
+            image (numpy.ndarray): The input image.
+            on_stage_done (callable, optional): Called as on_stage_done(name, image) after each stage.
+            on_stage_error (callable, optional): Called as on_stage_error(name, exception) when a stage fails.
+                The failed stage is skipped and the pipeline continues with the previous image.
+                If not given, the exception is raised.
+            on_stage_start (callable, optional): Called as on_stage_start(name, index, total) before each stage.
+            should_cancel (callable, optional): Checked before each stage; PipelineCancelled is raised
+                when it returns True.
+
+        Returns:
+            numpy.ndarray: The output of the last successful stage.
+        """
+        total = len(self.stages)
+        key = hash_array(image) if self.cache is not None else None
+        for index, (name, func, params, pass_cache, pass_artifact_sink) in enumerate(self.stages):
+            if should_cancel is not None and should_cancel():
+                raise PipelineCancelled(f"Cancelled before stage '{name}'.")
+            if on_stage_start is not None:
+                on_stage_start(name, index, total)
+
+            result = None
+            if self.cache is not None:
+                result_key = stage_key(key, f"{name}:{func.__module__}.{func.__qualname__}", params)
+                if not pass_cache and not (pass_artifact_sink and self.artifact_sink.enabled):
+                    result = self.cache.get(result_key)
+
+            if result is None:
+                call_params = dict(params, cache=self.cache) if pass_cache and self.cache is not None else params
+                if pass_artifact_sink:
+                    call_params = dict(call_params, artifact_sink=self.artifact_sink)
+                try:
+                    with span(f"image.stage.{name}"):
+                        result = func(image, **call_params)
+                except Exception as e:
+                    if on_stage_error is None:
+                        raise
+                    on_stage_error(name, e)
+                    continue
+                if self.cache is not None and not pass_cache:
+                    self.cache.put(result_key, result)
+
+            if self.cache is not None:
+                key = result_key
+            image = result
+            if self.artifact_sink.enabled:
+                self.artifact_sink.save(name, image)
+            if on_stage_done is not None:
+                on_stage_done(name, image)
+
+        return image
+
+
+def build_image_pipeline(techniques, noise_method="bilateral", cache=None, depth_session=None, depth_backend=None,
+                         artifact_sink=null_artifact_sink, contrast_equalization="global", clahe_tile_grid=(8, 8),
+                         clahe_clip_limit=2.0):
+    """
+    Build the pipeline for the techniques selected in the processing options.
+
+    Stages always run in the order contrast, noise removal, upscaling, depth/anaglyph.
+
+    Args:
+        techniques (list): Technique labels, e.g. "Adjust Contrast", "Noise Removal",
+            "Upscale x2" or "Depth Map and Anaglyph".
+        noise_method (str): Noise removal method, "bilateral" or "wavelet".
+        cache (ResultCache, optional): Cache for stage outputs and depth maps.
+        depth_session (DepthSession, optional): Runs the depth stage and keeps its depth map, so the
+            anaglyph can be adjusted afterwards without rerunning the pipeline.
+        depth_backend (str, optional): Depth backend for this job, e.g. "int8" for throughput jobs.
+        artifact_sink (optional): Receives every stage output and the contrast stage's intermediate
+            images, e.g. a DirectoryArtifactSink for debugging.
+        contrast_equalization (str): Equalization of the contrast stage, "global" or "clahe".
+        clahe_tile_grid (tuple): CLAHE grid as (columns, rows) of tiles.
+        clahe_clip_limit (float): CLAHE contrast limit per tile.
+
+    Returns:
+        ImagePipeline: The configured pipeline.
+    """
+    pipeline = ImagePipeline(cache=cache, artifact_sink=artifact_sink)
+
+    if "Adjust Contrast" in techniques:
+        if contrast_equalization == "clahe":
+            pipeline.add_stage("Adjust Contrast", enhance_image, pass_artifact_sink=True, equalization="clahe",
+                               clip_limit=clahe_clip_limit, tile_grid=tuple(clahe_tile_grid))
+        else:
+            pipeline.add_stage("Adjust Contrast", enhance_image, pass_artifact_sink=True)
+
+    if "Noise Removal" in techniques:
+        pipeline.add_stage("Noise Removal", denoise_image, method=noise_method)
+
+    upscale_technique = next((technique for technique in techniques if technique.startswith("Upscale x")), None)
+    if upscale_technique:
+        upscale_factor = int(upscale_technique.split("x")[1])
+        pipeline.add_stage(upscale_technique, upscale_stage, factor=upscale_factor)
+
+    if "Depth Map and Anaglyph" in techniques:
+        if depth_session is not None:
+            pipeline.add_stage("Depth Map and Anaglyph", depth_session.process, pass_cache=True,
+                               backend=depth_backend)
+        else:
+            pipeline.add_stage("Depth Map and Anaglyph", depth_and_anaglyph, pass_cache=True,
+                               backend=depth_backend)
+
+    return pipeline
+
+
+def prewarm(load_models=False, upscale_scales=(2, 4, 8)):
+    """
+    Import the heavy libraries used by the image stages and optionally load their models.
+
+    Args:
+        load_models (bool): Also load the DPT depth model and the LapSRN networks.
+        upscale_scales (tuple): LapSRN scale factors to load when load_models is True.
+    """
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+    import skimage.restoration  # noqa: F401
+    import PIL.Image  # noqa: F401
+
+    if load_models:
+        superres_engine.warm_up(upscale_scales)
+        depth_model_registry.get_backend()
+
+
+def start_prewarm_thread(load_models=False):
+    """
+    Run prewarm on a daemon thread, e.g. right after the main window is shown.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def run():
+        try:
+            prewarm(load_models=load_models)
+        except Exception as e:
+            # Prewarming is only an optimization; the stage will report the real error when used
+            print(f"Prewarm failed: {e}")
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def hash_array(array):
+    """
+    Content hash of an image: pixel bytes plus shape and dtype.
+
+    Args:
+        array (numpy.ndarray): The image.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((array.shape, array.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def stage_key(input_key, stage_name, params=None):
+    """
+    Key of a stage output, derived from the key of its input, the stage and its parameters.
+
+    Chaining keys means only the original input has to be hashed; every later stage is identified
+    by how it was produced.
+
+    Args:
+        input_key (str): Key (or content hash) of the stage input.
+        stage_name (str): Name of the stage.
+        params (dict, optional): Parameters that change the stage output.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(input_key.encode())
+    digest.update(stage_name.encode())
+    digest.update(repr(sorted((params or {}).items())).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    A two-tier LRU cache of stage results keyed by content-derived keys.
+
+    The memory tier keeps recently used arrays up to max_memory_bytes. If disk_dir is given,
+    every result is also stored there as a .npy file, and the directory is trimmed to
+    max_disk_bytes by evicting the least recently used files.
+
+    Stored arrays are read-only; get() returns a writable copy, so callers and later stages can
+    modify a cached result in place exactly as they would a freshly computed one.
+    """
+
+    def __init__(self, max_memory_bytes=512 * 1024 * 1024, disk_dir=None, max_disk_bytes=4 * 1024 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def get(self, key):
+        """
+        Look up a result.
+
+        Args:
+            key (str): Result key.
+
+        Returns:
+            numpy.ndarray or None: A writable copy of the cached array, or None on a miss.
+        """
+        with self._lock:
+            array = self._memory.get(key)
+            if array is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return array.copy()
+
+        if self.disk_dir is not None:
+            path = self._disk_path(key)
+            try:
+                array = np.load(path)
+            except (FileNotFoundError, ValueError, OSError):
+                array = None
+            if array is not None:
+                # Refresh the access time used for disk eviction
+                os.utime(path)
+                stored = array.copy()
+                stored.flags.writeable = False
+                with self._lock:
+                    self.hits += 1
+                    self._store_in_memory(key, stored)
+                return array
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, array):
+        """
+        Store a result in both tiers.
+
+        Args:
+            key (str): Result key.
+            array (numpy.ndarray): The result; a read-only copy is kept.
+        """
+        array = np.array(array, copy=True)
+        array.flags.writeable = False
+
+        with self._lock:
+            self._store_in_memory(key, array)
+
+        if self.disk_dir is not None:
+            # Write under a temporary name so readers never see a partial file
+            temp_path = self._disk_path(key) + f".{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as cache_file:
+                np.save(cache_file, array)
+            os.replace(temp_path, self._disk_path(key))
+            self._trim_disk()
+
+    def _store_in_memory(self, key, array):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        if array.nbytes > self.max_memory_bytes:
+            return
+        self._memory[key] = array
+        self._memory_bytes += array.nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _trim_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".npy"):
+                stat = entry.stat()
+                # get() touches files on every hit, so mtime is the last access time
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_disk_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def clear(self):
+        """Empties the memory tier (the disk tier is left alone)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+
+# Shared memory-only cache used by the GUI
+image_result_cache = ResultCache()
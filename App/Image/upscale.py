@@ -1,44 +1,333 @@
 import cv2
+import numpy as np
 import os
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
-def upscale_image(input_image_path, model_path):
+from instrumentation import span
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_FILES = {
+    2: "LapSRN_x2.pb",
+    4: "LapSRN_x4.pb",
+    8: "LapSRN_x8.pb"
+}
+
+# Edge length of a tile in input pixels for tiled upscaling
+DEFAULT_TILE_SIZE = 512
+
+
+def model_path_for_scale(scale_factor):
     """
-    Upscales an image using the specified DNN super-resolution model.
-    
+    Returns the path of the bundled LapSRN model for a scale factor.
+
     Args:
-        input_image_path (str): Path to the input image.
-        model_path (str): Path to the pre-trained model file.
+        scale_factor (int): The upscale factor (2, 4, or 8).
 
     Returns:
-        numpy.ndarray: The upscaled image.
+        str: Path to the model file.
     """
-    # Initialize the DNN super-resolution model
-    sr = cv2.dnn_superres.DnnSuperResImpl_create()
+    if scale_factor not in MODEL_FILES:
+        raise ValueError("Unsupported model scale. Use 2, 4, or 8.")
+    return os.path.join(MODEL_DIR, MODEL_FILES[scale_factor])
+
 
-    # Extract scale factor from the model file name (e.g., "LapSRN_x2.pb" -> 2)
+def scale_from_model_path(model_path):
+    """
+    Extract the scale factor from the model file name (e.g., "LapSRN_x2.pb" -> 2).
+
+    Args:
+        model_path (str): Path to the pre-trained model file.
+
+    Returns:
+        int: The scale factor.
+    """
     if "x2" in model_path.lower():
-        scale_factor = 2
+        return 2
     elif "x4" in model_path.lower():
-        scale_factor = 4
+        return 4
     elif "x8" in model_path.lower():
-        scale_factor = 8
-    else:
-        raise ValueError("Unsupported model scale. Use 'x2', 'x4', or 'x8' in the model file name.")
+        return 8
+    raise ValueError("Unsupported model scale. Use 'x2', 'x4', or 'x8' in the model file name.")
+
+
+class SuperResolutionEngine:
+    """
+    Keeps parsed LapSRN networks in memory so repeated upscales don't re-read the .pb files.
+
+    Networks are kept in an LRU keyed by scale factor. Each network has its own lock because
+    a DnnSuperResImpl instance must not run two upsamples at the same time. Parallel tiled
+    upscaling keeps a separate pool of networks per scale factor, one per worker, which is
+    reused by later calls.
+    """
+
+    def __init__(self, max_models=3):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._worker_pools = {}
+        self._lock = threading.Lock()
+
+    def _load(self, scale_factor, model_path):
+        with span("model.load.lapsrn"):
+            sr = cv2.dnn_superres.DnnSuperResImpl_create()
+            sr.readModel(model_path)
+            sr.setModel("lapsrn", scale_factor)
+        return sr
+
+    def get(self, scale_factor, model_path=None):
+        """
+        Return the network for a scale factor, loading it if it is not cached.
+
+        Args:
+            scale_factor (int): The upscale factor (2, 4, or 8).
+            model_path (str, optional): Model file to use instead of the bundled one.
+
+        Returns:
+            tuple: (DnnSuperResImpl, threading.Lock) for the requested scale.
+        """
+        if model_path is None:
+            model_path = model_path_for_scale(scale_factor)
+
+        with self._lock:
+            entry = self._models.get(scale_factor)
+            if entry is not None and entry[0] == model_path:
+                self._models.move_to_end(scale_factor)
+                return entry[1], entry[2]
+
+            entry = (model_path, self._load(scale_factor, model_path), threading.Lock())
+            self._models[scale_factor] = entry
+            self._models.move_to_end(scale_factor)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+        return entry[1], entry[2]
+
+    def _worker_pool(self, scale_factor, model_path, size):
+        """
+        Return the pool of worker networks for a scale factor, loading networks until it holds `size`.
+
+        Returns:
+            queue.Queue: Networks to borrow with get() and hand back with put().
+        """
+        with self._lock:
+            entry = self._worker_pools.get(scale_factor)
+            if entry is None or entry[0] != model_path:
+                entry = [model_path, queue.Queue(), 0]
+                self._worker_pools[scale_factor] = entry
+            while entry[2] < size:
+                entry[1].put(self._load(scale_factor, model_path))
+                entry[2] += 1
+        return entry[1]
+
+    def warm_up(self, scale_factors=(2, 4, 8)):
+        """
+        Load the networks for the given scale factors ahead of the first upscale.
+
+        Args:
+            scale_factors (iterable): Scale factors to preload.
+        """
+        for scale_factor in scale_factors:
+            self.get(scale_factor)
+
+    def upscale(self, image, scale_factor, model_path=None):
+        """
+        Upscales an in-memory image with the cached network for the scale factor.
+
+        Args:
+            image (numpy.ndarray): The input image.
+            scale_factor (int): The upscale factor (2, 4, or 8).
+            model_path (str, optional): Model file to use instead of the bundled one.
+
+        Returns:
+            numpy.ndarray: The upscaled image.
+        """
+        sr, sr_lock = self.get(scale_factor, model_path)
+
+        # Ensure the image is in RGB format
+        if len(image.shape) == 2 or image.shape[2] != 3:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+
+        # Apply super-resolution
+        with sr_lock:
+            upscaled_image = sr.upsample(image)
+
+        return upscaled_image
+
+    def upscale_tiled(self, image, scale_factor, tile_size=DEFAULT_TILE_SIZE, overlap=16, workers=1,
+                      model_path=None):
+        """
+        Upscales a large image tile by tile so peak memory follows the tile size, not the image size.
+
+        Tiles overlap by `overlap` input pixels and are feathered into the output with linear
+        ramps across the overlap, which hides the seams. With workers > 1, tiles are upsampled
+        in parallel, each worker thread borrowing its own network from a pool kept across calls.
+
+        Args:
+            image (numpy.ndarray): The input image.
+            scale_factor (int): The upscale factor (2, 4, or 8).
+            tile_size (int): Edge length of a tile in input pixels.
+            overlap (int): Overlap between neighbouring tiles in input pixels.
+            workers (int): Number of tiles upsampled at the same time.
+            model_path (str, optional): Model file to use instead of the bundled one.
+
+        Returns:
+            numpy.ndarray: The upscaled image.
+        """
+        if overlap < 0 or tile_size <= overlap:
+            raise ValueError("tile_size must be larger than overlap, and overlap must not be negative.")
+
+        if len(image.shape) == 2 or image.shape[2] != 3:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+
+        height, width = image.shape[:2]
+        if height <= tile_size and width <= tile_size:
+            return self.upscale(image, scale_factor, model_path)
 
-    # Load the model and set the scale factor
-    sr.readModel(model_path)
-    sr.setModel("lapsrn", scale_factor)
+        y_tiles = _tile_ranges(height, tile_size, overlap)
+        x_tiles = _tile_ranges(width, tile_size, overlap)
+        tiles = [(y0, y1, x0, x1) for y0, y1 in y_tiles for x0, x1 in x_tiles]
 
+        output = np.zeros((height * scale_factor, width * scale_factor, 3), dtype=image.dtype)
+
+        if workers <= 1:
+            sr, sr_lock = self.get(scale_factor, model_path)
+
+            def upsample_tile(tile):
+                y0, y1, x0, x1 = tile
+                with sr_lock:
+                    return sr.upsample(image[y0:y1, x0:x1])
+
+            results = map(upsample_tile, tiles)
+            for tile, upscaled_tile in zip(tiles, results):
+                _blend_tile(output, upscaled_tile, tile, y_tiles, x_tiles, scale_factor)
+            return output
+
+        # A DnnSuperResImpl can't be shared between threads, so every worker borrows its own copy
+        if model_path is None:
+            model_path = model_path_for_scale(scale_factor)
+        networks = self._worker_pool(scale_factor, model_path, workers)
+
+        def upsample_tile_parallel(tile):
+            y0, y1, x0, x1 = tile
+            sr = networks.get()
+            try:
+                return sr.upsample(image[y0:y1, x0:x1])
+            finally:
+                networks.put(sr)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Submit a bounded window of tiles so finished tiles don't pile up waiting to be blended
+            pending = deque()
+            for tile in tiles:
+                pending.append((tile, executor.submit(upsample_tile_parallel, tile)))
+                if len(pending) >= 2 * workers:
+                    done_tile, future = pending.popleft()
+                    _blend_tile(output, future.result(), done_tile, y_tiles, x_tiles, scale_factor)
+            while pending:
+                done_tile, future = pending.popleft()
+                _blend_tile(output, future.result(), done_tile, y_tiles, x_tiles, scale_factor)
+
+        return output
+
+    def clear(self):
+        """Drops every cached network, including the worker pools."""
+        with self._lock:
+            self._models.clear()
+            self._worker_pools.clear()
+
+
+def _tile_ranges(length, tile_size, overlap):
+    """Returns (start, end) pairs covering [0, length) with tiles that overlap by `overlap`."""
+    stride = tile_size - overlap
+    ranges = []
+    for start in range(0, max(length - overlap, 1), stride):
+        ranges.append((start, min(start + tile_size, length)))
+    return ranges
+
+
+def _feather_ramp(size):
+    """Linear 0..1 weights across an overlap of the given size."""
+    return (np.arange(size, dtype=np.float32) + 0.5) / size
+
+
+def _blend_tile(output, upscaled_tile, tile, y_tiles, x_tiles, scale_factor):
+    """Writes an upscaled tile into the output, feathering it over the previous top and left neighbours."""
+    y0, y1, x0, x1 = tile
+    out_y0, out_x0 = y0 * scale_factor, x0 * scale_factor
+    tile_height, tile_width = upscaled_tile.shape[:2]
+
+    # Overlap with the tiles above and to the left (already written, tiles arrive in raster order)
+    y_index = [start for start, _ in y_tiles].index(y0)
+    x_index = [start for start, _ in x_tiles].index(x0)
+    overlap_y = (y_tiles[y_index - 1][1] - y0) * scale_factor if y_index > 0 else 0
+    overlap_x = (x_tiles[x_index - 1][1] - x0) * scale_factor if x_index > 0 else 0
+
+    if overlap_y == 0 and overlap_x == 0:
+        output[out_y0:out_y0 + tile_height, out_x0:out_x0 + tile_width] = upscaled_tile
+        return
+
+    weight_y = np.ones(tile_height, dtype=np.float32)
+    weight_y[:overlap_y] = _feather_ramp(overlap_y)
+    weight_x = np.ones(tile_width, dtype=np.float32)
+    weight_x[:overlap_x] = _feather_ramp(overlap_x)
+
+    # Blend the overlap bands, then copy the rest of the tile as is
+    if overlap_y:
+        band = (slice(0, overlap_y), slice(0, tile_width))
+        _blend_band(output, upscaled_tile, band, out_y0, out_x0, weight_y[:overlap_y, np.newaxis] * weight_x)
+    if overlap_x:
+        band = (slice(overlap_y, tile_height), slice(0, overlap_x))
+        _blend_band(output, upscaled_tile, band, out_y0, out_x0,
+                    np.broadcast_to(weight_x[:overlap_x], (tile_height - overlap_y, overlap_x)))
+
+    output[out_y0 + overlap_y:out_y0 + tile_height, out_x0 + overlap_x:out_x0 + tile_width] = \
+        upscaled_tile[overlap_y:, overlap_x:]
+
+
+def _blend_band(output, upscaled_tile, band, out_y0, out_x0, weight):
+    """Blends one rectangular band of a tile into the output with per-pixel weights."""
+    rows, cols = band
+    target = output[out_y0 + rows.start:out_y0 + rows.stop, out_x0 + cols.start:out_x0 + cols.stop]
+    weight = weight[..., np.newaxis]
+    blended = target * (1.0 - weight) + upscaled_tile[rows, cols] * weight
+    target[...] = np.clip(blended + 0.5, 0, 255).astype(output.dtype)
+
+
+# Shared instance so every caller in the process reuses the same parsed networks
+superres_engine = SuperResolutionEngine()
+
+
+def upscale_array(image, model_path):
+    """
+    Upscales an in-memory image using the specified DNN super-resolution model.
+
+    Args:
+        image (numpy.ndarray): The input image.
+        model_path (str): Path to the pre-trained model file.
+
+    Returns:
+        numpy.ndarray: The upscaled image.
+    """
+    return superres_engine.upscale(image, scale_from_model_path(model_path), model_path)
+
+
+def upscale_image(input_image_path, model_path):
+    """
+    Upscales an image using the specified DNN super-resolution model.
+    
+    Args:
+        input_image_path (str): Path to the input image.
+        model_path (str): Path to the pre-trained model file.
+
+    Returns:
+        numpy.ndarray: The upscaled image.
+    """
     # Load the input image
     image = cv2.imread(input_image_path)
     if image is None:
         raise ValueError("Input image not found. Check the file path.")
-    
-    # Ensure the image is in RGB format
-    if len(image.shape) == 2 or image.shape[2] != 3:
-        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-
-    # Apply super-resolution
-    upscaled_image = sr.upsample(image)
 
-    return upscaled_image
+    return upscale_array(image, model_path)
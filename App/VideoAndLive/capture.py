@@ -0,0 +1,115 @@
+import threading
+import time
+
+import cv2
+
+from instrumentation import span
+
+
+class LatestFrameCapture:
+    """
+    Reads frames from a camera on its own thread and keeps only the most recent one.
+
+    Consumers always get the freshest frame; frames that were replaced before anyone read them are
+    counted as dropped instead of piling up in the driver buffer.
+    """
+
+    def __init__(self, source=0):
+        self.source = source
+        self.capture = None
+        self._thread = None
+        self._running = threading.Event()
+        self._condition = threading.Condition()
+
+        self._frame = None
+        self._frame_id = 0
+        self._consumed_id = 0
+
+        self.captured_frames = 0
+        self.processed_frames = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        """Open the camera (if needed) and start the capture thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.capture is None or not self.capture.isOpened():
+            self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise ValueError("Error opening camera.")
+
+        self._running.set()
+        self._thread = threading.Thread(target=self._read_loop, name="live-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the capture thread and release the camera."""
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.capture is not None and self.capture.isOpened():
+            self.capture.release()
+        with self._condition:
+            self._condition.notify_all()
+
+    def frame_rate(self):
+        """Frame rate reported by the camera, or 0 if it doesn't report one."""
+        if self.capture is None or not self.capture.isOpened():
+            return 0
+        return self.capture.get(cv2.CAP_PROP_FPS)
+
+    def is_running(self):
+        return self._running.is_set()
+
+    def _read_loop(self):
+        while self._running.is_set():
+            with span("live.capture"):
+                ret, frame = self.capture.read()
+            if not ret:
+                # Avoid spinning while the camera has nothing to give
+                time.sleep(0.01)
+                continue
+
+            with self._condition:
+                # The previous frame was never handed out, so it is dropped
+                if self._frame_id > self._consumed_id:
+                    self.dropped_frames += 1
+                self._frame = frame
+                self._frame_id += 1
+                self.captured_frames += 1
+                self._condition.notify_all()
+
+    def read_latest(self, timeout=None):
+        """
+        Return the newest frame that hasn't been handed out yet.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a new frame. None returns immediately.
+
+        Returns:
+            numpy.ndarray or None: The frame, or None if no new frame arrived in time.
+        """
+        with self._condition:
+            if self._frame_id == self._consumed_id and timeout is not None:
+                self._condition.wait_for(
+                    lambda: self._frame_id > self._consumed_id or not self._running.is_set(), timeout)
+            if self._frame_id == self._consumed_id:
+                return None
+
+            self._consumed_id = self._frame_id
+            return self._frame
+
+    def mark_processed(self):
+        """Count a frame returned by read_latest as fully processed."""
+        with self._condition:
+            self.processed_frames += 1
+
+    def stats(self):
+        """Returns the captured, processed and dropped frame counters."""
+        with self._condition:
+            return {
+                "captured": self.captured_frames,
+                "processed": self.processed_frames,
+                "dropped": self.dropped_frames,
+            }
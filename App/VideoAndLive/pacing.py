@@ -0,0 +1,78 @@
+import time
+
+
+DEFAULT_FRAME_RATE = 30.0
+
+
+class FramePacer:
+    """
+    Schedules frame processing against the source frame rate instead of a fixed timer interval.
+
+    Frame n is due at start + n / frame_rate. When processing falls behind, the next frame is
+    scheduled immediately and display is skipped until the schedule is met again (encoding is
+    never skipped). In offline mode frames are processed as fast as possible and the preview is
+    refreshed at most display_rate times per second.
+    """
+
+    def __init__(self, frame_rate=DEFAULT_FRAME_RATE, offline=False, display_rate=15.0):
+        if not frame_rate or frame_rate <= 0:
+            frame_rate = DEFAULT_FRAME_RATE
+        self.frame_interval = 1.0 / frame_rate
+        self.offline = offline
+        self.display_interval = 1.0 / display_rate
+
+        self.start_time = None
+        self.frame_index = 0
+        self.last_display_time = None
+        self.average_processing_time = 0.0
+        self._frame_start = None
+
+    def start(self):
+        """Reset the schedule; call when playback starts."""
+        self.start_time = time.perf_counter()
+        self.frame_index = 0
+        self.last_display_time = None
+        self.average_processing_time = 0.0
+
+    def frame_started(self):
+        if self.start_time is None:
+            self.start()
+        self._frame_start = time.perf_counter()
+
+    def frame_finished(self):
+        """Record the processing time of the current frame and advance the schedule."""
+        elapsed = time.perf_counter() - self._frame_start
+        # Exponential moving average, so one slow frame doesn't swing the estimate
+        if self.frame_index == 0:
+            self.average_processing_time = elapsed
+        else:
+            self.average_processing_time = 0.9 * self.average_processing_time + 0.1 * elapsed
+        self.frame_index += 1
+
+    def is_behind(self):
+        """True when the current frame finished later than one interval past its due time."""
+        due_time = self.start_time + self.frame_index * self.frame_interval
+        return time.perf_counter() > due_time + self.frame_interval
+
+    def should_display(self):
+        """Whether the frame that was just processed should be painted."""
+        now = time.perf_counter()
+        if self.offline:
+            if self.last_display_time is not None and now - self.last_display_time < self.display_interval:
+                return False
+        elif self.is_behind():
+            return False
+        self.last_display_time = now
+        return True
+
+    def next_delay_ms(self):
+        """Milliseconds to wait before processing the next frame."""
+        if self.offline:
+            return 0
+        due_time = self.start_time + self.frame_index * self.frame_interval
+        return max(0, int((due_time - time.perf_counter()) * 1000))
+
+    def effective_frame_rate(self):
+        """Frames per second achieved since start()."""
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0
+        return self.frame_index / elapsed if elapsed > 0 else 0.0
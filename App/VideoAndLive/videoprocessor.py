@@ -1,5 +1,72 @@
 import cv2
 import numpy as np
+import os
+import queue
+import threading
+
+from instrumentation import instrumented
+
+
+def _put_until_stopped(target_queue, item, stop_event, timeout=0.1):
+    """Puts an item on a bounded queue, giving up if the pipeline is stopped. Returns True on success."""
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get_until_stopped(source_queue, stop_event, timeout=0.1):
+    """Gets an item from a queue, returning None if the pipeline is stopped first."""
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=timeout)
+        except queue.Empty:
+            continue
+    return None
+
+# Gradient buffer type for each depth precision mode
+GRADIENT_DTYPES = {
+    "float64": np.float64,
+    "float32": np.float32,
+    "int16": np.int16,
+}
+
+def _normalized_sqrt_table(low, high):
+    """
+    Depth levels of sqrt(2 * v) for v in 0..high, normalized so low maps to 0 and high to 255.
+
+    Matches cv2.normalize(..., NORM_MINMAX) followed by the truncating cast of the float64 path.
+    """
+    values = np.sqrt(2.0 * np.arange(high + 1))
+    if high <= low:
+        return np.zeros(high + 1, dtype=np.uint8)
+    scale = 255.0 / (values[high] - values[low])
+    return np.clip(values * scale - values[low] * scale, 0, 255).astype(np.uint8)
+
+
+class AnaglyphFrameContext:
+    """Coordinate grids and scratch buffers for one frame resolution, reused across frames."""
+
+    def __init__(self, height, width, precision="float64"):
+        self.shape = (height, width)
+        self.precision = precision
+        self.x_coords = np.arange(width, dtype=np.intp)[np.newaxis, :]
+        self.row_offsets = (np.arange(height, dtype=np.intp) * width)[:, np.newaxis]
+
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.blur = np.empty((height, width), dtype=np.uint8)
+        self.grad_x = np.empty((height, width), dtype=GRADIENT_DTYPES[precision])
+        self.grad_y = np.empty((height, width), dtype=GRADIENT_DTYPES[precision])
+        self.depth_map = np.empty((height, width), dtype=np.uint8)
+        self.shifts = np.empty((height, width), dtype=np.int32)
+        self.left_index = np.empty((height, width), dtype=np.intp)
+        self.right_index = np.empty((height, width), dtype=np.intp)
+        self.blue = np.empty((height, width), dtype=np.uint8)
+        self.green = np.empty((height, width), dtype=np.uint8)
+        self.red = np.empty((height, width), dtype=np.uint8)
 
 class VideoProcessor:
     def __init__(self):
@@ -7,8 +74,25 @@ class VideoProcessor:
         self.color_intensity = 1.2
         self.brightness_factor = 0.8
 
-    def process_video_to_3d(self, video_path,output_path='output_3d_video.avi'):
-        """Takes the video path as input and applies 3D anaglyph transformation to the video"""
+        # Precision of the gradient depth estimate: "float64" (reference), "float32", or "int16"
+        # (int16 Sobel with a lookup table for the square root)
+        self.precision = "float64"
+
+        # LUTs are rebuilt only when the effect parameters change; buffers are kept per thread
+        # because process_video_to_3d runs create_anaglyph on several threads at once
+        self._tables = None
+        self._local = threading.local()
+
+    def process_video_to_3d(self, video_path,output_path='output_3d_video.avi', num_workers=None, queue_size=16):
+        """Takes the video path as input and applies 3D anaglyph transformation to the video.
+
+        Decoding, anaglyph processing and encoding overlap: a reader thread feeds a bounded queue,
+        num_workers threads create the anaglyphs, and a writer thread puts the frames back in order
+        and encodes them. At most queue_size frames are in flight between reading and writing, so a
+        stalled worker can't make the writer buffer the rest of the video.
+
+        update_frame is called with every anaglyph frame, in order, from the writer thread rather
+        than the calling thread."""
         # Open the video file
         video_cap = cv2.VideoCapture(video_path)
         if not video_cap.isOpened():
@@ -23,71 +107,210 @@ class VideoProcessor:
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
         video_writer = cv2.VideoWriter(output_path, fourcc, frame_rate, (frame_width, frame_height))
 
-        while True:
-            ret, frame = video_cap.read()
-            if not ret:
-                break
+        if num_workers is None:
+            num_workers = min(4, os.cpu_count() or 1)
 
-            # Apply 3D effect
-            anaglyph_frame = self.create_anaglyph(frame)
-            self.update_frame(anaglyph_frame)
+        frame_queue = queue.Queue(maxsize=queue_size)
+        result_queue = queue.Queue(maxsize=queue_size)
+        # One slot per frame that has been read but not written yet; the writer frees them
+        in_flight = threading.Semaphore(queue_size)
+        stop_event = threading.Event()
+        errors = []
 
-            # Write the processed frame to the video
-            video_writer.write(anaglyph_frame)
+        def run_stage(target):
+            # Any failure stops the other stages so nobody blocks forever on a full or empty queue
+            def wrapper():
+                try:
+                    target()
+                except Exception as e:
+                    errors.append(e)
+                    stop_event.set()
+            return wrapper
+
+        def read_frames():
+            index = 0
+            while not stop_event.is_set():
+                while not in_flight.acquire(timeout=0.1):
+                    if stop_event.is_set():
+                        return
+                ret, frame = video_cap.read()
+                if not ret:
+                    break
+                if not _put_until_stopped(frame_queue, (index, frame), stop_event):
+                    return
+                index += 1
+            for _ in range(num_workers):
+                _put_until_stopped(frame_queue, None, stop_event)
+
+        def process_frames():
+            while True:
+                item = _get_until_stopped(frame_queue, stop_event)
+                if item is None:
+                    _put_until_stopped(result_queue, None, stop_event)
+                    return
+                index, frame = item
+                # Apply 3D effect
+                if not _put_until_stopped(result_queue, (index, self.create_anaglyph(frame)), stop_event):
+                    return
+
+        def write_frames():
+            pending = {}
+            next_index = 0
+            finished_workers = 0
+            while finished_workers < num_workers:
+                item = _get_until_stopped(result_queue, stop_event)
+                if item is None:
+                    if stop_event.is_set():
+                        return
+                    finished_workers += 1
+                    continue
+                index, anaglyph_frame = item
+                pending[index] = anaglyph_frame
+
+                # Reassemble the original frame order before encoding
+                while next_index in pending:
+                    anaglyph_frame = pending.pop(next_index)
+                    self.update_frame(anaglyph_frame)
+
+                    # Write the processed frame to the video
+                    video_writer.write(anaglyph_frame)
+                    in_flight.release()
+                    next_index += 1
+
+        threads = [threading.Thread(target=run_stage(read_frames), name="video-reader")]
+        threads += [threading.Thread(target=run_stage(process_frames), name=f"video-worker-{i}")
+                    for i in range(num_workers)]
+        threads.append(threading.Thread(target=run_stage(write_frames), name="video-writer"))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
 
         # Release the video reader and writer
         video_cap.release()
         video_writer.release()
 
+        if errors:
+            raise errors[0]
+
         return output_path  # Return the path to the processed video
 
-    def process_live_to_3d(self, frame):
+    def process_live_to_3d(self, frame, out=None):
         """Applies 3D anaglyph transformation to live feed and returns the processed frame"""
         # Apply the 3D anaglyph effect
-        anaglyph_frame = self.create_anaglyph(frame)
+        anaglyph_frame = self.create_anaglyph(frame, out=out)
 
         return anaglyph_frame  # Return the processed live frame
 
-    def create_anaglyph(self, frame):
-        """Converts a single frame to 3D anaglyph format"""
+    def _lookup_tables(self):
+        """Returns the shift and intensity LUTs, rebuilding them when the effect parameters change."""
+        key = (self.shift_amount, self.color_intensity, self.brightness_factor)
+        tables = self._tables
+        if tables is None or tables[0] != key:
+            levels = np.arange(256)
+            # Same arithmetic as applying the formula to every pixel of the depth map, done once per level
+            shift_lut = np.int32(self.shift_amount * (1.0 - levels / 255.0))
+            intensity_lut = np.uint8(np.clip(levels * self.color_intensity * self.brightness_factor, 0, 255))
+            tables = (key, shift_lut, intensity_lut)
+            self._tables = tables
+        return tables[1], tables[2]
+
+    def frame_context(self, height, width):
+        """Returns the calling thread's AnaglyphFrameContext for a resolution, creating it on first use."""
+        context = getattr(self._local, "context", None)
+        if context is None or context.shape != (height, width) or context.precision != self.precision:
+            if self.precision not in GRADIENT_DTYPES:
+                raise ValueError("Invalid precision specified. Choose 'float64', 'float32' or 'int16'.")
+            context = AnaglyphFrameContext(height, width, self.precision)
+            self._local.context = context
+        return context
+
+    def _estimate_depth(self, frame, ctx):
+        """Fills ctx.depth_map with the normalized gradient depth estimate of the frame."""
         # Fast grayscale conversion
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=ctx.gray)
 
         # Apply Gaussian blur
-        blur = cv2.GaussianBlur(gray, (3, 3), 0)
+        cv2.GaussianBlur(ctx.gray, (3, 3), 0, dst=ctx.blur)
+
+        if ctx.precision == "int16":
+            # 3x3 Sobel of 8-bit input is exact in int16 and gx + gy (at most 2040) still fits, so only
+            # the square root is left; it goes through a table over the few distinct values instead
+            cv2.Sobel(ctx.blur, cv2.CV_16S, 1, 0, dst=ctx.grad_x, ksize=3)
+            cv2.Sobel(ctx.blur, cv2.CV_16S, 0, 1, dst=ctx.grad_y, ksize=3)
+            np.add(ctx.grad_x, ctx.grad_y, out=ctx.grad_x)
+            # Negative sums are NaN in the float64 path and end up as depth 0
+            np.maximum(ctx.grad_x, 0, out=ctx.grad_x)
+            low, high = cv2.minMaxLoc(ctx.grad_x)[:2]
+            np.take(_normalized_sqrt_table(int(low), int(high)), ctx.grad_x, out=ctx.depth_map, mode="clip")
+            return
 
         # Compute gradients
-        grad_x = cv2.Sobel(blur, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(blur, cv2.CV_64F, 0, 1, ksize=3)
+        ddepth = cv2.CV_32F if ctx.precision == "float32" else cv2.CV_64F
+        cv2.Sobel(ctx.blur, ddepth, 1, 0, dst=ctx.grad_x, ksize=3)
+        cv2.Sobel(ctx.blur, ddepth, 0, 1, dst=ctx.grad_y, ksize=3)
 
         # Create depth map from the gradients
-        depth_map = np.sqrt(grad_x * 2 + grad_y * 2)
-        depth_map = cv2.normalize(depth_map, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        if ctx.precision == "float32":
+            # Same expression as below; the factor 2 is dropped since normalization removes it
+            np.add(ctx.grad_x, ctx.grad_y, out=ctx.grad_x)
+            np.maximum(ctx.grad_x, 0, out=ctx.grad_x)
+            cv2.sqrt(ctx.grad_x, ctx.grad_x)
+        else:
+            np.multiply(ctx.grad_x, 2, out=ctx.grad_x)
+            np.multiply(ctx.grad_y, 2, out=ctx.grad_y)
+            np.add(ctx.grad_x, ctx.grad_y, out=ctx.grad_x)
+            np.sqrt(ctx.grad_x, out=ctx.grad_x)
+        cv2.normalize(ctx.grad_x, ctx.grad_y, 0, 255, cv2.NORM_MINMAX)
+        np.copyto(ctx.depth_map, ctx.grad_y, casting="unsafe")
 
-        # Split the channels of the original frame
-        b, g, r = cv2.split(frame)
+    def estimate_depth(self, frame):
+        """Returns the gradient based depth map of a frame, computed at the current precision."""
+        ctx = self.frame_context(*frame.shape[:2])
+        self._estimate_depth(frame, ctx)
+        return ctx.depth_map.copy()
 
-        # Calculate the amount of shift based on the depth map
-        shifts = np.int32(self.shift_amount * (1.0 - depth_map / 255.0))
+    @instrumented("video.create_anaglyph")
+    def create_anaglyph(self, frame, out=None):
+        """Converts a single frame to 3D anaglyph format.
 
-        # Apply horizontal shift to create the 3D effect
+        If out is given (same shape and dtype as frame) the anaglyph is written into it."""
         height, width = frame.shape[:2]
-        y_coords, x_coords = np.mgrid[0:height, 0:width]
+        ctx = self.frame_context(height, width)
+        shift_lut, intensity_lut = self._lookup_tables()
 
-        left_x = np.clip(x_coords + shifts, 0, width - 1)
-        right_x = np.clip(x_coords - shifts, 0, width - 1)
+        self._estimate_depth(frame, ctx)
+
+        # Calculate the amount of shift based on the depth map
+        np.take(shift_lut, ctx.depth_map, out=ctx.shifts, mode="clip")
+
+        # Apply horizontal shift to create the 3D effect, as flat indices into the interleaved frame
+        np.add(ctx.x_coords, ctx.shifts, out=ctx.left_index)
+        np.clip(ctx.left_index, 0, width - 1, out=ctx.left_index)
+        np.subtract(ctx.x_coords, ctx.shifts, out=ctx.right_index)
+        np.clip(ctx.right_index, 0, width - 1, out=ctx.right_index)
+        np.add(ctx.left_index, ctx.row_offsets, out=ctx.left_index)
+        np.add(ctx.right_index, ctx.row_offsets, out=ctx.right_index)
+        np.multiply(ctx.left_index, 3, out=ctx.left_index)
+        np.multiply(ctx.right_index, 3, out=ctx.right_index)
 
         # Create the anaglyph image
-        anaglyph = np.zeros_like(frame)
-        anaglyph[:, :, 2] = r[y_coords, left_x]  # Red channel
-        anaglyph[:, :, 0] = b[y_coords, right_x]  # Blue channel
-        anaglyph[:, :, 1] = g[y_coords, right_x]  # Green channel
+        pixels = np.ascontiguousarray(frame).reshape(-1)
+        np.take(pixels, ctx.right_index, out=ctx.blue, mode="clip")  # Blue channel
+        ctx.right_index += 1
+        np.take(pixels, ctx.right_index, out=ctx.green, mode="clip")  # Green channel
+        ctx.left_index += 2
+        np.take(pixels, ctx.left_index, out=ctx.red, mode="clip")  # Red channel
+
+        if out is None:
+            out = np.empty_like(frame)
+        cv2.merge((ctx.blue, ctx.green, ctx.red), dst=out)
 
         # Apply color intensity adjustment
-        intensity_lut = np.uint8(np.clip(np.arange(256) * self.color_intensity * self.brightness_factor, 0, 255))
-        anaglyph = cv2.LUT(anaglyph, intensity_lut)
+        cv2.LUT(out, intensity_lut, dst=out)
 
-        return anaglyph
+        return out
 
     def update_frame(self, anaglyph_frame):
+        """Hook for progress display; process_video_to_3d calls it from its writer thread."""
         pass
\ No newline at end of file
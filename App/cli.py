@@ -0,0 +1,315 @@
+"""
+Headless batch conversion of images and videos, without loading Qt.
+
+Example:
+    python cli.py photos/ "clips/*.mp4" --contrast --denoise wavelet --upscale 2 --depth \
+        --output-dir out --workers 2
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+
+
+def collect_inputs(patterns):
+    """
+    Expand files, glob patterns and directories into a sorted list of image and video files.
+
+    Args:
+        patterns (list): Paths, glob patterns or directories.
+
+    Returns:
+        list: Absolute paths of the supported input files, without duplicates.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern, recursive=True) or [pattern]
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS):
+                paths.append(os.path.abspath(path))
+    return sorted(set(paths))
+
+
+class JobManifest:
+    """
+    A JSON record of finished and failed files, so an interrupted batch can be resumed.
+
+    Entries are keyed by input path and remember the options and output path they were produced
+    with; a file is only skipped when both match and its output still exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                self.entries = json.load(manifest_file).get("files", {})
+
+    def is_done(self, input_path, options, output_path):
+        entry = self.entries.get(input_path)
+        return (entry is not None and entry.get("status") == "done" and entry.get("options") == options
+                and entry.get("output") == output_path and os.path.exists(output_path))
+
+    def record(self, input_path, entry):
+        with self._lock:
+            self.entries[input_path] = entry
+            # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as manifest_file:
+                json.dump({"files": self.entries}, manifest_file, indent=2)
+            os.replace(temp_path, self.path)
+
+
+def job_options(args):
+    """The options that determine the output of a file, as stored in the manifest."""
+    return {
+        "contrast": args.contrast,
+        "contrast_mode": args.contrast_mode,
+        "clahe_tiles": f"{args.clahe_tiles[0]}x{args.clahe_tiles[1]}",
+        "clahe_clip": args.clahe_clip,
+        "denoise": args.denoise,
+        "upscale": args.upscale,
+        "depth": args.depth,
+        "depth_backend": args.depth_backend,
+    }
+
+
+def selected_techniques(args):
+    """Translate the command-line flags into ImagePage technique labels."""
+    techniques = []
+    if args.contrast:
+        techniques.append("Adjust Contrast")
+    if args.denoise:
+        techniques.append("Noise Removal")
+    if args.upscale:
+        techniques.append(f"Upscale x{args.upscale}")
+    if args.depth:
+        techniques.append("Depth Map and Anaglyph")
+    return techniques
+
+
+def parse_tile_grid(text):
+    """Parse a CLAHE grid such as "8x8" into (columns, rows); used as an argparse type."""
+    try:
+        columns, rows = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected COLUMNSxROWS such as 8x8, got '{text}'")
+    if columns < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"tile counts must be at least 1, got '{text}'")
+    return columns, rows
+
+
+def output_paths_for(input_paths, output_dir):
+    """
+    Map every input file to its own output path.
+
+    The input's directory relative to the common directory of all inputs is mirrored under
+    output_dir, and the source extension stays in the name, so inputs that share a base name
+    (a/img.jpg, a/img.png, b/img.png) never overwrite each other.
+
+    Args:
+        input_paths (list): Absolute input paths.
+        output_dir (str): Directory for the converted files.
+
+    Returns:
+        dict: {input path: absolute output path}.
+    """
+    if not input_paths:
+        return {}
+    root = os.path.commonpath([os.path.dirname(path) for path in input_paths])
+    output_dir = os.path.abspath(output_dir)
+    outputs = {}
+    taken = set()
+    for input_path in input_paths:
+        relative_dir = os.path.relpath(os.path.dirname(input_path), root)
+        stem, extension = os.path.splitext(os.path.basename(input_path))
+        suffix = ".avi" if extension.lower() in VIDEO_EXTENSIONS else ".png"
+        base = os.path.normpath(os.path.join(output_dir, relative_dir, f"{stem}_{extension.lstrip('.')}_3d"))
+        output_path = base + suffix
+        # Only reachable on case-insensitive file systems (img.JPG and img.jpg), but never share a file
+        counter = 1
+        while os.path.normcase(output_path) in taken:
+            output_path = f"{base}_{counter}{suffix}"
+            counter += 1
+        taken.add(os.path.normcase(output_path))
+        outputs[input_path] = output_path
+    return outputs
+
+
+def process_image_file(input_path, output_path, args, cache=None):
+    """Run the selected image stages on one file and return per-stage timings in seconds."""
+    from Image.artifacts import DirectoryArtifactSink, null_artifact_sink
+    from Image.pipeline import build_image_pipeline
+
+    artifact_sink = null_artifact_sink
+    if args.artifacts_dir:
+        # Named like the output, so inputs sharing a base name get separate directories
+        relative_output = os.path.relpath(os.path.splitext(output_path)[0], os.path.abspath(args.output_dir))
+        artifact_sink = DirectoryArtifactSink(os.path.join(args.artifacts_dir, relative_output))
+
+    image = cv2.imread(input_path)
+    if image is None:
+        raise FileNotFoundError(f"Image at '{input_path}' could not be loaded.")
+
+    stage_times = {}
+    stage_start = [time.perf_counter()]
+
+    def on_stage_done(name, _):
+        now = time.perf_counter()
+        stage_times[name] = now - stage_start[0]
+        stage_start[0] = now
+
+    pipeline = build_image_pipeline(selected_techniques(args), noise_method=args.denoise or "bilateral",
+                                    cache=cache, depth_backend=args.depth_backend, artifact_sink=artifact_sink,
+                                    contrast_equalization=args.contrast_mode,
+                                    clahe_tile_grid=args.clahe_tiles, clahe_clip_limit=args.clahe_clip)
+    result = pipeline.run(image, on_stage_done=on_stage_done)
+    if not cv2.imwrite(output_path, result):
+        raise IOError(f"Could not write '{output_path}'.")
+    return stage_times
+
+
+def process_video_file(input_path, output_path, args):
+    """Convert one video to anaglyph 3D and return its timing."""
+    from VideoAndLive.videoprocessor import VideoProcessor
+
+    start = time.perf_counter()
+    VideoProcessor().process_video_to_3d(input_path, output_path)
+    return {"Video Anaglyph": time.perf_counter() - start}
+
+
+def process_file(input_path, output_path, args, cache=None):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    start = time.perf_counter()
+    if input_path.lower().endswith(VIDEO_EXTENSIONS):
+        stage_times = process_video_file(input_path, output_path, args)
+    else:
+        stage_times = process_image_file(input_path, output_path, args, cache)
+    return output_path, time.perf_counter() - start, stage_times
+
+
+def print_report(results):
+    """Print the per-file timing table."""
+    if not results:
+        print("Nothing to do.")
+        return
+    name_width = max(len(os.path.basename(path)) for path in results)
+    print(f"{'File':<{name_width}}  {'Status':<8}  {'Seconds':>8}  Stages")
+    for path, entry in results.items():
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in entry.get("stages", {}).items())
+        seconds = entry.get("seconds")
+        seconds_text = f"{seconds:8.2f}" if seconds is not None else f"{'-':>8}"
+        print(f"{os.path.basename(path):<{name_width}}  {entry['status']:<8}  {seconds_text}  "
+              f"{stages or entry.get('error', '')}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert images and videos to anaglyph 3D without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="Files, glob patterns or directories to process.")
+    parser.add_argument("--output-dir", default="output", help="Directory for the converted files.")
+    parser.add_argument("--contrast", action="store_true", help="Adjust contrast (images).")
+    parser.add_argument("--contrast-mode", choices=["global", "clahe"], default="global",
+                        help="Histogram equalization of --contrast: global, or tiled adaptive (CLAHE) on the luma.")
+    parser.add_argument("--clahe-tiles", type=parse_tile_grid, default="8x8", help="CLAHE tile grid as COLUMNSxROWS.")
+    parser.add_argument("--clahe-clip", type=float, default=2.0, help="CLAHE contrast limit per tile.")
+    parser.add_argument("--denoise", choices=["bilateral", "wavelet"], help="Remove noise (images).")
+    parser.add_argument("--upscale", type=int, choices=[2, 4, 8], help="Upscale with LapSRN (images).")
+    parser.add_argument("--depth", action="store_true", help="Generate depth map and anaglyph (images).")
+    parser.add_argument("--depth-backend", choices=["eager", "torchscript", "onnx", "int8"], default="eager",
+                        help="How the depth model is run; exported graphs are usually faster on CPU, "
+                             "int8 trades a little depth accuracy for speed.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of files processed at the same time.")
+    parser.add_argument("--manifest", help="Job manifest for resuming (default: <output-dir>/manifest.json).")
+    parser.add_argument("--force", action="store_true", help="Reprocess files the manifest marks as done.")
+    parser.add_argument("--report", help="Also write the timing report as JSON to this path.")
+    parser.add_argument("--metrics", help="Record per-stage timings and write them to this path "
+                                          "(Prometheus text for .prom files, JSON otherwise).")
+    parser.add_argument("--track-allocations", action="store_true",
+                        help="Also record allocations in --metrics with tracemalloc. Slows every stage down, and "
+                             "the numbers are process-wide, so only meaningful with --workers 1.")
+    parser.add_argument("--artifacts-dir", help="Write the output of every stage to this directory (for debugging).")
+    parser.add_argument("--cache-dir", help="Keep stage results in this directory so reruns skip unchanged stages.")
+    parser.add_argument("--cache-size", type=float, default=4.0, help="Maximum size of --cache-dir in GB.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("No supported input files found.", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.track_allocations and not args.metrics:
+        print("--track-allocations needs --metrics.", file=sys.stderr)
+        return 1
+    if args.track_allocations and args.workers > 1:
+        print("Warning: allocations of concurrent jobs are mixed with --workers > 1.", file=sys.stderr)
+    if args.metrics:
+        import instrumentation
+        instrumentation.enable(track_allocations=args.track_allocations)
+    manifest = JobManifest(args.manifest or os.path.join(args.output_dir, "manifest.json"))
+    options = job_options(args)
+    output_paths = output_paths_for(inputs, args.output_dir)
+
+    pending = [path for path in inputs if args.force or not manifest.is_done(path, options, output_paths[path])]
+    skipped = len(inputs) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} file(s) already done according to {manifest.path}.")
+
+    # Import the processing modules up front so their load time isn't charged to the first file
+    if any(not path.lower().endswith(VIDEO_EXTENSIONS) for path in pending):
+        import Image.pipeline  # noqa: F401
+    if any(path.lower().endswith(VIDEO_EXTENSIONS) for path in pending):
+        import VideoAndLive.videoprocessor  # noqa: F401
+
+    cache = None
+    if args.cache_dir:
+        from Image.resultcache import ResultCache
+        cache = ResultCache(disk_dir=args.cache_dir, max_disk_bytes=int(args.cache_size * 1024 ** 3))
+
+    results = {}
+    # Threads share the warm models of the process (depth registry, LapSRN engine)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(process_file, path, output_paths[path], args, cache): path for path in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                output_path, seconds, stage_times = future.result()
+                entry = {"status": "done", "output": output_path, "seconds": seconds,
+                         "stages": stage_times, "options": options}
+            except Exception as e:
+                entry = {"status": "failed", "error": str(e), "options": options}
+            manifest.record(path, entry)
+            results[path] = entry
+            print(f"{entry['status']}: {path}")
+
+    ordered_results = {path: results[path] for path in pending}
+    print_report(ordered_results)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as report_file:
+            json.dump(ordered_results, report_file, indent=2)
+
+    if args.metrics:
+        instrumentation.registry.dump(args.metrics)
+
+    return 0 if all(entry["status"] == "done" for entry in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Image.depthandanaglyp import create_anaglyph
+from VideoAndLive.videoprocessor import VideoProcessor
+from multithreading import VideoProcessor as ReferenceVideoProcessor
+
+
+def create_anaglyph_loop(image, depth_map, shift=15):
+    """Original per-pixel implementation of Image.depthandanaglyp.create_anaglyph, kept as the reference."""
+    rows, cols, _ = image.shape
+    depth_map = cv2.resize(depth_map, (cols, rows))
+    depth_map = cv2.bilateralFilter(depth_map, d=9, sigmaColor=75, sigmaSpace=75)
+    depth_map = cv2.normalize(depth_map, None, 0, 255, cv2.NORM_MINMAX)
+    depth_map = np.power(depth_map / 255.0, 0.5) * 255
+    depth_map = depth_map.astype(np.uint8)
+
+    left_image = np.zeros_like(image)
+    right_image = np.zeros_like(image)
+
+    for row in range(rows):
+        for col in range(cols):
+            # int() keeps the product from wrapping in uint8 under NumPy 2 scalar promotion
+            shift_value = int(shift * int(depth_map[row, col]) / 255)
+            if col + shift_value < cols:
+                left_image[row, col] = image[row, col + shift_value]
+            if col - shift_value >= 0:
+                right_image[row, col] = image[row, col - shift_value]
+
+    anaglyph = np.zeros_like(image)
+    weight = depth_map / 255.0
+    anaglyph[:, :, 0] = (1 - weight) * left_image[:, :, 0] + weight * right_image[:, :, 0]
+    anaglyph[:, :, 1] = right_image[:, :, 1] * (1 - weight)
+    anaglyph[:, :, 2] = right_image[:, :, 2] * (1 - weight)
+
+    gamma = 1.2
+    anaglyph = np.power(anaglyph / 255.0, gamma) * 255
+    return anaglyph.astype(np.uint8)
+
+
+def check_parity(sizes=((120, 160), (97, 211), (240, 320)), shifts=(0, 7, 15, 40), seed=0):
+    """Checks that both warping backends of create_anaglyph are bit-identical to the loop."""
+    rng = np.random.default_rng(seed)
+    failures = 0
+
+    for rows, cols in sizes:
+        image = rng.integers(0, 256, (rows, cols, 3), dtype=np.uint8)
+        depth_map = rng.integers(0, 256, (rows // 2 + 1, cols // 2 + 1), dtype=np.uint8)
+
+        for shift in shifts:
+            expected = create_anaglyph_loop(image, depth_map, shift=shift)
+            for method in ("index", "remap"):
+                result = create_anaglyph(image, depth_map, shift=shift, method=method)
+                if not np.array_equal(result, expected):
+                    failures += 1
+                    mismatched = np.count_nonzero(result != expected)
+                    print(f"MISMATCH {cols}x{rows} shift={shift} method={method}: {mismatched} values differ")
+
+    print("Parity OK" if failures == 0 else f"{failures} parity failures")
+    return failures == 0
+
+
+def check_video_parity(sizes=((120, 160), (97, 211), (360, 640)), seed=0):
+    """Checks VideoProcessor.create_anaglyph against the unoptimized copy kept in multithreading.py."""
+    rng = np.random.default_rng(seed)
+    processor = VideoProcessor()
+    reference = ReferenceVideoProcessor()
+    failures = 0
+
+    with np.errstate(invalid="ignore"):
+        for rows, cols in sizes:
+            for settings in ((15, 1.2, 0.8), (30, 1.0, 1.0)):
+                for processor_settings in (processor, reference):
+                    (processor_settings.shift_amount, processor_settings.color_intensity,
+                     processor_settings.brightness_factor) = settings
+                for _ in range(2):
+                    frame = cv2.GaussianBlur(rng.integers(0, 256, (rows, cols, 3), dtype=np.uint8), (5, 5), 0)
+                    expected = reference.create_anaglyph(frame)
+                    results = (processor.create_anaglyph(frame),
+                               processor.create_anaglyph(frame, out=np.empty_like(frame)))
+                    for result in results:
+                        if not np.array_equal(result, expected):
+                            failures += 1
+                            mismatched = np.count_nonzero(result != expected)
+                            print(f"MISMATCH video {cols}x{rows} settings={settings}: {mismatched} values differ")
+
+    print("Video parity OK" if failures == 0 else f"{failures} video parity failures")
+    return failures == 0
+
+
+# Allowed deviation of each fast precision mode from the float64 depth map: (mean, max) in depth levels.
+# Both modes compute the same expression, so only rounding may differ; with the default shift of 15 px
+# one pixel of shift spans 17 depth levels, so a level of difference moves nothing on screen.
+PRECISION_TOLERANCES = {
+    "float32": (0.05, 1),
+    "int16": (0.05, 1),
+}
+
+SAMPLE_IMAGES = ("background.jpeg", "projectposter.jpeg", "backlog.jpeg")
+
+
+def check_precision_modes(seed=0):
+    """Compares the float32 and int16 gradient depth maps against the float64 reference within tolerances."""
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+    frames = [cv2.imread(os.path.join(repo_root, name)) for name in SAMPLE_IMAGES]
+    frames = [frame for frame in frames if frame is not None]
+    rng = np.random.default_rng(seed)
+    frames.append(cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (7, 7), 0))
+
+    processor = VideoProcessor()
+    failures = 0
+    for frame in frames:
+        processor.precision = "float64"
+        # The float64 expression is NaN where grad_x + grad_y < 0 (those pixels become 0)
+        with np.errstate(invalid="ignore"):
+            reference = processor.estimate_depth(frame).astype(np.int16)
+        for precision, (mean_tolerance, max_tolerance) in PRECISION_TOLERANCES.items():
+            processor.precision = precision
+            difference = np.abs(processor.estimate_depth(frame) - reference)
+            mean_difference, max_difference = difference.mean(), difference.max()
+            status = "ok" if mean_difference <= mean_tolerance and max_difference <= max_tolerance else "FAIL"
+            print(f"{status} {precision} {frame.shape[1]}x{frame.shape[0]}: "
+                  f"mean {mean_difference:.3f}, max {max_difference} depth levels")
+            if status == "FAIL":
+                failures += 1
+
+    print("Precision modes OK" if failures == 0 else f"{failures} precision mode failures")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    results = [check_parity(), check_video_parity(), check_precision_modes()]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from Image.contrast import ContrastEngine
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160), "12MP": (4000, 3000)}
+SAMPLE_IMAGE = "background.jpeg"
+
+
+def test_image(width, height):
+    """The sample image resized to the given resolution (random pixels if it is missing)."""
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+    image = cv2.imread(os.path.join(repo_root, SAMPLE_IMAGE))
+    if image is None:
+        return np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare global histogram equalization with CLAHE.")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--grids", nargs="+", default=["8x8", "16x16"], help="CLAHE tile grids as COLUMNSxROWS.")
+    parser.add_argument("--clip-limit", type=float, default=2.0)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Also write the results as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    engine = ContrastEngine()
+    results = []
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        image = test_image(width, height)
+        buffer = np.empty_like(image)
+
+        modes = [("global", "global", (8, 8))]
+        modes += [(f"clahe {grid}", "clahe", tuple(int(size) for size in grid.split("x"))) for grid in args.grids]
+        for label, method, grid in modes:
+            def equalize():
+                np.copyto(buffer, image)
+                return engine.equalize_in_place(buffer, method, args.clip_limit, grid)
+
+            def enhance():
+                return engine.enhance(image, out=buffer, equalization=method, clip_limit=args.clip_limit,
+                                      tile_grid=grid)
+
+            # The first call also builds the LUT and the CLAHE object; later calls reuse them
+            enhance()
+            results.append({
+                "resolution": resolution,
+                "mode": label,
+                "equalize_ms": median_ms(equalize, args.repeats),
+                "enhance_ms": median_ms(enhance, args.repeats),
+            })
+
+    print(f"{'Resolution':<10} {'Mode':<12} {'equalize ms':>12} {'enhance ms':>11}")
+    for result in results:
+        print(f"{result['resolution']:<10} {result['mode']:<12} {result['equalize_ms']:>12.1f} "
+              f"{result['enhance_ms']:>11.1f}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
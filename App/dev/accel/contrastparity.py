@@ -0,0 +1,73 @@
+import os
+import sys
+import timeit
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from Image.contrast import adjust_brightness_contrast, apply_gamma_correction, equalize_histogram, ContrastEngine
+
+SAMPLE_IMAGES = ("background.jpeg", "projectposter.jpeg", "backlog.jpeg")
+
+# (alpha, beta, gamma): the defaults of enhance_image plus darkening, saturating and identity settings
+PARAMETER_SETS = (
+    (1.2, 25, 1.5),
+    (0.7, -40, 0.8),
+    (2.5, 10.5, 2.2),
+    (1.0, 0, 1.0),
+    (-1.5, 300, 0.5),
+)
+
+
+def enhance_three_step(image, alpha, beta, gamma):
+    """The original chain the fused engine has to reproduce."""
+    adjusted_image = adjust_brightness_contrast(image, alpha=alpha, beta=beta)
+    gamma_corrected_image = apply_gamma_correction(adjusted_image, gamma=gamma)
+    return equalize_histogram(gamma_corrected_image)
+
+
+def sample_images(seed=0):
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+    images = [cv2.imread(os.path.join(repo_root, name)) for name in SAMPLE_IMAGES]
+    images = [image for image in images if image is not None]
+    rng = np.random.default_rng(seed)
+    images.append(rng.integers(0, 256, (361, 643, 3), dtype=np.uint8))
+    images.append(rng.integers(0, 256, (240, 320), dtype=np.uint8))
+    return images
+
+
+def check_contrast_parity():
+    """Checks that ContrastEngine.enhance is bit-identical to the three-step chain."""
+    engine = ContrastEngine()
+    failures = 0
+    for image in sample_images():
+        for alpha, beta, gamma in PARAMETER_SETS:
+            expected = enhance_three_step(image, alpha, beta, gamma)
+            results = (engine.enhance(image, alpha, beta, gamma),
+                       engine.enhance(image, alpha, beta, gamma, out=np.empty_like(image)))
+            for result in results:
+                if not np.array_equal(result, expected):
+                    failures += 1
+                    print(f"FAIL {image.shape} alpha={alpha} beta={beta} gamma={gamma}: "
+                          f"{np.count_nonzero(result != expected)} pixels differ")
+
+    print("Contrast parity OK" if failures == 0 else f"{failures} contrast mismatches")
+    return failures == 0
+
+
+def benchmark(width=3840, height=2160, repeats=10):
+    image = cv2.resize(sample_images()[0], (width, height))
+    engine = ContrastEngine()
+    out = np.empty_like(image)
+    three_step = timeit.timeit(lambda: enhance_three_step(image, 1.2, 25, 1.5), number=repeats) / repeats
+    fused = timeit.timeit(lambda: engine.enhance(image, 1.2, 25, 1.5, out=out), number=repeats) / repeats
+    print(f"{width}x{height}: three-step {three_step * 1000:.1f} ms, fused {fused * 1000:.1f} ms "
+          f"({three_step / fused:.1f}x)")
+
+
+if __name__ == "__main__":
+    ok = check_contrast_parity()
+    benchmark()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from Image.depthbackends import DEPTH_BACKENDS
+from Image.modelregistry import DEFAULT_DEPTH_MODEL
+from dev.accel.peakmemory import peak_rss_mb
+
+
+def bench_backend(backend, model_name, export_dir, runs, width, height):
+    """Times the depth map of one backend (preprocessing, prediction, normalization) in the current process."""
+    from Image.depthandanaglyp import _load_rgb_image, normalize_depth
+    from Image.depthbackends import create_depth_backend
+    from Image.modelregistry import depth_model_registry
+
+    image = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    model, feature_extractor = depth_model_registry.get(model_name)
+    # Built here rather than through the registry so the graphs go to export_dir
+    depth_backend = create_depth_backend(backend, model, model_name, export_dir)
+    load_seconds = time.perf_counter() - start
+
+    def depth_map():
+        pixel_values = feature_extractor(images=_load_rgb_image(image), return_tensors="pt")["pixel_values"]
+        return normalize_depth(depth_backend.predict(pixel_values)[0])
+
+    # The first call exports (or loads) the graph for this resolution
+    start = time.perf_counter()
+    depth_map()
+    first_call_seconds = time.perf_counter() - start
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        depth_map()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "first_call_seconds": first_call_seconds,
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))] * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare latency and peak memory of the depth backends.")
+    parser.add_argument("--model", default=DEFAULT_DEPTH_MODEL, help="DPT model name or local path.")
+    parser.add_argument("--backends", nargs="+", choices=DEPTH_BACKENDS, default=list(DEPTH_BACKENDS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--export-dir", help="Where to export the graphs (default: a temporary directory).")
+    parser.add_argument("--output", help="Also write the results as JSON to this path.")
+    parser.add_argument("--single", choices=DEPTH_BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    export_dir = args.export_dir or tempfile.mkdtemp(prefix="depth-export-")
+
+    if args.single:
+        print(json.dumps(bench_backend(args.single, args.model, export_dir, args.runs, args.width, args.height)))
+        return 0
+
+    # Each backend runs in a fresh interpreter so peak memory isn't shared between them
+    results = []
+    for backend in args.backends:
+        command = [sys.executable, os.path.abspath(__file__), "--single", backend, "--model", args.model,
+                   "--runs", str(args.runs), "--width", str(args.width), "--height", str(args.height),
+                   "--export-dir", export_dir]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend} failed:\n{completed.stderr.strip().splitlines()[-1] if completed.stderr else ''}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(f"{'Backend':<12} {'median ms':>10} {'p95 ms':>10} {'first call s':>13} {'peak RSS MB':>12}")
+    for result in results:
+        peak = f"{result['peak_rss_mb']:>12.0f}" if result["peak_rss_mb"] is not None else f"{'-':>12}"
+        print(f"{result['backend']:<12} {result['median_ms']:>10.1f} {result['p95_ms']:>10.1f} "
+              f"{result['first_call_seconds']:>13.2f} {peak}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0 if len(results) == len(args.backends) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from Image.depthandanaglyp import _load_rgb_image, normalize_depth
+from Image.depthbackends import create_depth_backend
+from Image.modelregistry import depth_model_registry, DEFAULT_DEPTH_MODEL
+
+SAMPLE_IMAGES = ("background.jpeg", "projectposter.jpeg", "backlog.jpeg")
+
+# Backends that should reproduce the eager model; int8 is lossy by design and is checked
+# with depthquantization.py instead
+EXPORTED_BACKENDS = ("torchscript", "onnx")
+
+# Largest allowed difference from the eager prediction, relative to the prediction's range,
+# and in levels of the 8-bit depth map
+RELATIVE_TOLERANCE = 1e-3
+DEPTH_MAP_TOLERANCE = 1
+
+
+def sample_images(seed=0):
+    repo_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+    images = [cv2.imread(os.path.join(repo_root, name)) for name in SAMPLE_IMAGES]
+    images = [image for image in images if image is not None]
+    rng = np.random.default_rng(seed)
+    images.append(cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (7, 7), 0))
+    return images
+
+
+def check_backend_parity(model_name=DEFAULT_DEPTH_MODEL, backends=EXPORTED_BACKENDS, export_dir=None):
+    """Compares the exported depth backends against the eager model on the sample images."""
+    model, feature_extractor = depth_model_registry.get(model_name)
+    eager = create_depth_backend("eager", model, model_name)
+    export_dir = export_dir or tempfile.mkdtemp(prefix="depth-export-")
+
+    failures = 0
+    for backend_name in backends:
+        try:
+            backend = create_depth_backend(backend_name, model, model_name, export_dir)
+        except ImportError as e:
+            print(f"skip {backend_name}: {e}")
+            continue
+
+        for image in sample_images():
+            pixel_values = feature_extractor(images=_load_rgb_image(image), return_tensors="pt")["pixel_values"]
+            expected = eager.predict(pixel_values)[0]
+            result = backend.predict(pixel_values)[0]
+
+            relative_difference = np.abs(result - expected).max() / max(np.ptp(expected), 1e-12)
+            map_difference = np.abs(normalize_depth(result).astype(np.int16)
+                                    - normalize_depth(expected).astype(np.int16)).max()
+            status = "ok" if relative_difference <= RELATIVE_TOLERANCE and map_difference <= DEPTH_MAP_TOLERANCE \
+                else "FAIL"
+            print(f"{status} {backend_name} {image.shape[1]}x{image.shape[0]}: relative {relative_difference:.2e}, "
+                  f"depth map max {map_difference} levels")
+            if status == "FAIL":
+                failures += 1
+
+    print("Depth backends OK" if failures == 0 else f"{failures} depth backend mismatches")
+    return failures == 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the exported depth backends against the eager model.")
+    parser.add_argument("--model", default=DEFAULT_DEPTH_MODEL, help="DPT model name or local path.")
+    parser.add_argument("--backends", nargs="+", choices=EXPORTED_BACKENDS, default=list(EXPORTED_BACKENDS))
+    parser.add_argument("--export-dir", help="Where to export the graphs (default: a temporary directory).")
+    args = parser.parse_args(argv)
+    return 0 if check_backend_parity(args.model, args.backends, args.export_dir) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Image.depthandanaglyp import _load_rgb_image
+from Image.depthbackends import create_depth_backend
+from Image.modelregistry import depth_model_registry, DEFAULT_DEPTH_MODEL
+from depthbackendparity import sample_images
+
+
+def normalized(depth):
+    """Scales a raw prediction to 0-1 the same way normalize_depth does before quantizing to 8 bits."""
+    depth = depth.astype(np.float64)
+    return (depth - depth.min()) / max(np.ptp(depth), 1e-12)
+
+
+def depth_accuracy(model_name=DEFAULT_DEPTH_MODEL, backend="int8"):
+    """
+    Compares a depth backend with the fp32 eager model on the sample images.
+
+    Returns:
+        list: One dict per image with the RMSE and SSIM of the normalized depth.
+    """
+    from skimage.metrics import structural_similarity
+
+    model, feature_extractor = depth_model_registry.get(model_name)
+    reference_backend = create_depth_backend("eager", model, model_name)
+    candidate_backend = create_depth_backend(backend, model, model_name)
+
+    results = []
+    for image in sample_images():
+        pixel_values = feature_extractor(images=_load_rgb_image(image), return_tensors="pt")["pixel_values"]
+        reference = normalized(reference_backend.predict(pixel_values)[0])
+        candidate = normalized(candidate_backend.predict(pixel_values)[0])
+        results.append({
+            "image": f"{image.shape[1]}x{image.shape[0]}",
+            "rmse": float(np.sqrt(np.mean((candidate - reference) ** 2))),
+            "ssim": float(structural_similarity(reference, candidate, data_range=1.0)),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report the depth accuracy of the int8 model against fp32 (speed and memory: depthbackendbench.py).")
+    parser.add_argument("--model", default=DEFAULT_DEPTH_MODEL, help="DPT model name or local path.")
+    parser.add_argument("--backend", default="int8", help="Backend to compare with the fp32 eager model.")
+    parser.add_argument("--max-rmse", type=float, help="Fail if the mean RMSE is above this.")
+    parser.add_argument("--min-ssim", type=float, help="Fail if the mean SSIM is below this.")
+    parser.add_argument("--output", help="Also write the results as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    results = depth_accuracy(args.model, args.backend)
+    for result in results:
+        print(f"{result['image']:>10}: RMSE {result['rmse']:.4f}, SSIM {result['ssim']:.4f}")
+    mean_rmse = float(np.mean([result["rmse"] for result in results]))
+    mean_ssim = float(np.mean([result["ssim"] for result in results]))
+    print(f"{'mean':>10}: RMSE {mean_rmse:.4f}, SSIM {mean_ssim:.4f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"images": results, "mean_rmse": mean_rmse, "mean_ssim": mean_ssim}, output_file, indent=2)
+
+    if args.max_rmse is not None and mean_rmse > args.max_rmse:
+        print(f"FAIL: mean RMSE {mean_rmse:.4f} above {args.max_rmse}")
+        return 1
+    if args.min_ssim is not None and mean_ssim < args.min_ssim:
+        print(f"FAIL: mean SSIM {mean_ssim:.4f} below {args.min_ssim}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,16 @@ import cv2
 import numpy as np
 import multiprocessing
 import os
+import queue
+import sys
+import tempfile
+import threading
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from dev.accel.sharedframes import SharedFrameRing
+
 def process_frames_in_chunk(frames, video_processor):
     """Applies the create_anaglyph function to each frame in the chunk."""
     processed_frames = []
@@ -11,6 +19,67 @@ def process_frames_in_chunk(frames, video_processor):
         processed_frames.append(video_processor.create_anaglyph(frame))
     return processed_frames
 
+# Per-process VideoProcessor used by the streaming pool workers
+_worker_processor = None
+
+def init_streaming_worker(shift_amount, color_intensity, brightness_factor):
+    """Creates the VideoProcessor each pool worker reuses, so it is not pickled with every batch."""
+    global _worker_processor
+    _worker_processor = VideoProcessor()
+    _worker_processor.shift_amount = shift_amount
+    _worker_processor.color_intensity = color_intensity
+    _worker_processor.brightness_factor = brightness_factor
+
+def process_frame_batch(frames):
+    """Applies create_anaglyph to a batch of frames inside a streaming pool worker."""
+    return [_worker_processor.create_anaglyph(frame) for frame in frames]
+
+def read_frame_batches(video_cap, batch_size, in_flight):
+    """Yields fixed-size batches of frames, waiting for a free in-flight slot before reading each batch."""
+    while True:
+        in_flight.acquire()
+        batch = []
+        while len(batch) < batch_size:
+            ret, frame = video_cap.read()
+            if not ret:
+                break
+            batch.append(frame)
+        if not batch:
+            in_flight.release()
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+
+# Shared-memory ring attached by each pool worker
+_worker_ring = None
+
+def init_shared_memory_worker(ring_spec, shift_amount, color_intensity, brightness_factor):
+    """Attaches the worker to the shared frame ring and creates its VideoProcessor."""
+    global _worker_ring
+    init_streaming_worker(shift_amount, color_intensity, brightness_factor)
+    _worker_ring = SharedFrameRing.attach(ring_spec)
+
+def process_frame_slot(slot):
+    """Reads the input frame in a ring slot and writes its anaglyph to the matching output slot."""
+    _worker_ring.outputs[slot] = _worker_processor.create_anaglyph(_worker_ring.inputs[slot])
+    return slot
+
+def read_frames_into_slots(video_cap, ring, free_slots):
+    """Decodes each frame straight into a free input slot and yields the slot index."""
+    while True:
+        slot = free_slots.get()
+        ret, frame = video_cap.read(ring.inputs[slot])
+        if not ret:
+            free_slots.put(slot)
+            return
+        if not np.shares_memory(frame, ring.inputs[slot]):
+            if frame.shape != ring.frame_shape:
+                raise ValueError(f"Frame of shape {frame.shape} does not match the {ring.frame_shape} ring slots "
+                                 "sized from the video's reported width and height.")
+            ring.inputs[slot][...] = frame
+        yield slot
+
 class VideoProcessor:
     def __init__(self):
         self.shift_amount = 15
@@ -70,6 +139,99 @@ class VideoProcessor:
         except Exception as e:
             print(f"An error occurred during video processing: {e}")
 
+    def process_video_streaming(self, video_path, output_path='output_3d_video.avi', num_processes=4,
+                                batch_size=16, max_in_flight=None):
+        """Processes a video with a process pool without holding the whole video in memory.
+
+        Frames are read in batches of batch_size and fed to the pool through an ordered imap;
+        processed batches are written as soon as they arrive. At most max_in_flight batches
+        (default 2 * num_processes) are decoded but not yet written at any time."""
+        video_cap = cv2.VideoCapture(video_path)
+        if not video_cap.isOpened():
+            raise ValueError("Error opening video file. Please check the file path and format.")
+
+        frame_width = int(video_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_rate = video_cap.get(cv2.CAP_PROP_FPS)
+
+        if max_in_flight is None:
+            max_in_flight = 2 * num_processes
+        # Pool.imap pulls from its input as fast as it can; the semaphore keeps that bounded
+        in_flight = threading.Semaphore(max_in_flight)
+
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        video_writer = cv2.VideoWriter(output_path, fourcc, frame_rate, (frame_width, frame_height))
+
+        try:
+            with multiprocessing.Pool(processes=num_processes, initializer=init_streaming_worker,
+                                      initargs=(self.shift_amount, self.color_intensity,
+                                                self.brightness_factor)) as pool:
+                batches = read_frame_batches(video_cap, batch_size, in_flight)
+                try:
+                    for processed_batch in pool.imap(process_frame_batch, batches):
+                        for frame in processed_batch:
+                            video_writer.write(frame)
+                        in_flight.release()
+                except BaseException:
+                    # Unblock the reader so the pool's task thread can shut down
+                    for _ in range(max_in_flight):
+                        in_flight.release()
+                    raise
+        finally:
+            video_cap.release()
+            video_writer.release()
+
+        return output_path
+
+    def process_video_shared_memory(self, video_path, output_path='output_3d_video.avi', num_processes=4,
+                                    num_slots=None):
+        """Processes a video with a process pool that exchanges frames through shared memory.
+
+        Frames are decoded into slots of a SharedFrameRing and the workers write the anaglyphs
+        into the matching output slots, so only slot indices are pickled between processes."""
+        video_cap = cv2.VideoCapture(video_path)
+        if not video_cap.isOpened():
+            raise ValueError("Error opening video file. Please check the file path and format.")
+
+        frame_width = int(video_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frame_height = int(video_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_rate = video_cap.get(cv2.CAP_PROP_FPS)
+
+        if num_slots is None:
+            num_slots = 2 * num_processes
+
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        video_writer = cv2.VideoWriter(output_path, fourcc, frame_rate, (frame_width, frame_height))
+
+        ring = SharedFrameRing(num_slots, (frame_height, frame_width, 3))
+        free_slots = queue.Queue()
+        for slot in range(num_slots):
+            free_slots.put(slot)
+
+        slots = read_frames_into_slots(video_cap, ring, free_slots)
+        try:
+            with multiprocessing.Pool(processes=num_processes, initializer=init_shared_memory_worker,
+                                      initargs=(ring.spec(), self.shift_amount, self.color_intensity,
+                                                self.brightness_factor)) as pool:
+                try:
+                    for slot in pool.imap(process_frame_slot, slots):
+                        video_writer.write(ring.outputs[slot])
+                        # The slot can only be refilled once its output has been encoded
+                        free_slots.put(slot)
+                except BaseException:
+                    # Unblock the reader so the pool's task thread can shut down
+                    for slot in range(num_slots):
+                        free_slots.put(slot)
+                    raise
+        finally:
+            # The suspended reader may still hold a view into the ring
+            slots.close()
+            video_cap.release()
+            video_writer.release()
+            ring.close()
+
+        return output_path
+
     def create_anaglyph(self, frame):
         """Converts a single frame to 3D anaglyph format."""
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -93,18 +255,24 @@ class VideoProcessor:
         return anaglyph
 
     def benchmark_processing(self, video_path):
-        """Compares processing time for single core, two core, four core, and six core execution."""
+        """
+        Compares processing time for single core, two core, four core, and six core execution.
+
+        Outputs go to a temporary directory. stagebench.py covers every stage with JSON output.
+        """
         core_counts = [1, 2, 4, 6]
         timings = {}
 
-        for cores in core_counts:
-            try:
-                start_time = time.time()
-                self.process_video_with_multiprocessing(video_path, output_path=f"output_{cores}_cores.avi", num_processes=cores)
-                end_time = time.time()
-                timings[cores] = end_time - start_time
-            except Exception as e:
-                print(f"An error occurred while processing with {cores} cores: {e}")
+        with tempfile.TemporaryDirectory(prefix="multithreading-bench-") as output_dir:
+            for cores in core_counts:
+                try:
+                    start_time = time.perf_counter()
+                    self.process_video_with_multiprocessing(
+                        video_path, output_path=os.path.join(output_dir, f"output_{cores}_cores.avi"),
+                        num_processes=cores)
+                    timings[cores] = time.perf_counter() - start_time
+                except Exception as e:
+                    print(f"An error occurred while processing with {cores} cores: {e}")
 
         for cores, timing in timings.items():
             print(f"Processing with {cores} cores took {timing:.2f} seconds.")
@@ -113,7 +281,9 @@ class VideoProcessor:
 
 if __name__ == "__main__":
     video_processor = VideoProcessor()
-    video_path = r"C:\Users\deniz\Downloads\Car Control Master.mp4"
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python multithreading.py VIDEO")
+    video_path = sys.argv[1]
     try:
         video_processor.benchmark_processing(video_path)
     except Exception as e:
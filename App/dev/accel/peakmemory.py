@@ -0,0 +1,63 @@
+import sys
+
+_MB = 1024 * 1024
+
+
+def _maxrss_to_mb(maxrss):
+    # ru_maxrss is in bytes on macOS and in KB on Linux and the BSDs
+    return maxrss / _MB if sys.platform == "darwin" else maxrss / 1024
+
+
+def _windows_peak_working_set():
+    """Peak working set of this process in bytes, from GetProcessMemoryInfo."""
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+    get_current_process.restype = wintypes.HANDLE
+    get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    get_process_memory_info.restype = wintypes.BOOL
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+        raise OSError("GetProcessMemoryInfo failed.")
+    return counters.PeakWorkingSetSize
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it can't be measured."""
+    if sys.platform == "win32":
+        try:
+            return _windows_peak_working_set() / _MB
+        except (AttributeError, OSError):
+            return None
+    try:
+        import resource
+    except ImportError:
+        return None
+    return _maxrss_to_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def peak_rss_children_mb():
+    """Peak resident memory of the largest finished child process in MB, or None where it isn't available."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    return _maxrss_to_mb(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
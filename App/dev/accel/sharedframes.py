@@ -0,0 +1,63 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """
+    A ring of fixed-size frame slots in shared memory, with one input and one output buffer per slot.
+
+    The owning process creates the ring and passes its names to the workers, which attach to the
+    same blocks. Frames are written and read in place, so only slot indices need to cross process
+    boundaries.
+    """
+
+    def __init__(self, num_slots, frame_shape, dtype=np.uint8, names=None):
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = names is None
+
+        slot_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        if self.owner:
+            self._input_shm = shared_memory.SharedMemory(create=True, size=slot_bytes * num_slots)
+            self._output_shm = shared_memory.SharedMemory(create=True, size=slot_bytes * num_slots)
+        else:
+            self._input_shm = shared_memory.SharedMemory(name=names[0])
+            self._output_shm = shared_memory.SharedMemory(name=names[1])
+
+        shape = (num_slots,) + self.frame_shape
+        self.inputs = np.ndarray(shape, dtype=self.dtype, buffer=self._input_shm.buf)
+        self.outputs = np.ndarray(shape, dtype=self.dtype, buffer=self._output_shm.buf)
+
+    @property
+    def names(self):
+        """Names of the input and output blocks, used by workers to attach."""
+        return self._input_shm.name, self._output_shm.name
+
+    def spec(self):
+        """Everything a worker needs to attach with SharedFrameRing.attach."""
+        return self.num_slots, self.frame_shape, self.dtype.str, self.names
+
+    @classmethod
+    def attach(cls, spec):
+        """Attach to a ring created by another process."""
+        num_slots, frame_shape, dtype, names = spec
+        return cls(num_slots, frame_shape, dtype=dtype, names=names)
+
+    def close(self):
+        """Detach from the shared blocks; the owner also frees them."""
+        # Drop the views first, the buffers can't be closed while arrays still reference them
+        self.inputs = None
+        self.outputs = None
+        self._input_shm.close()
+        self._output_shm.close()
+        if self.owner:
+            self._input_shm.unlink()
+            self._output_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,338 @@
+"""
+Benchmark every processing stage on synthetic and fixture inputs at several resolutions.
+
+Each stage and resolution runs in a fresh interpreter so its peak memory is its own. Results
+(median/p95 latency, throughput and peak RSS) are printed as a table and can be written as JSON
+and compared with the JSON of an earlier run to catch regressions.
+
+Example:
+    python dev/accel/stagebench.py --resolutions 640x360 1920x1080 --output bench.json
+    python dev/accel/stagebench.py --compare bench.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Image.modelregistry import DEFAULT_DEPTH_MODEL
+from dev.accel.peakmemory import peak_rss_children_mb, peak_rss_mb
+
+FIXTURE_IMAGES = ("background.jpeg", "projectposter.jpeg", "backlog.jpeg")
+
+IMAGE_STAGES = (
+    "adjust_brightness_contrast",
+    "apply_gamma_correction",
+    "equalize_histogram",
+    "equalize_histogram_clahe",
+    "remove_noise_bilateral",
+    "remove_noise_wavelet",
+    "upscale_x2",
+    "generate_depth_map",
+    "create_anaglyph_remap",
+    "create_anaglyph_index",
+    "video_anaglyph_float64",
+    "video_anaglyph_float32",
+    "video_anaglyph_int16",
+)
+VIDEO_STAGES = ("process_video_to_3d", "process_video_streaming")
+STAGES = IMAGE_STAGES + VIDEO_STAGES
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def synthetic_image(width, height, seed=0):
+    """A smooth random image with some structure, so filters and the depth model see more than noise."""
+    rng = np.random.default_rng(seed)
+    noise = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    gradient = np.linspace(0, 96, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    return np.clip(noise * 0.7 + gradient, 0, 255).astype(np.uint8)
+
+
+def image_inputs(width, height, use_fixtures=True):
+    """Returns (name, image) pairs: the synthetic image and the repository's sample images resized."""
+    inputs = [("synthetic", synthetic_image(width, height))]
+    if use_fixtures:
+        repo_root = os.path.join(APP_DIR, "..")
+        for name in FIXTURE_IMAGES:
+            image = cv2.imread(os.path.join(repo_root, name))
+            if image is not None:
+                inputs.append((name, cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)))
+    return inputs
+
+
+def synthetic_video(path, width, height, frames):
+    """Writes a short video of a synthetic image drifting sideways."""
+    base = synthetic_image(width + frames, height)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (width, height))
+    for index in range(frames):
+        writer.write(np.ascontiguousarray(base[:, index:index + width]))
+    writer.release()
+    return path
+
+
+def image_stage(stage, args):
+    """Returns a function running one image stage on a BGR image; heavy modules are imported here only."""
+    if stage == "adjust_brightness_contrast":
+        from Image.contrast import adjust_brightness_contrast
+        return lambda image: adjust_brightness_contrast(image, alpha=1.2, beta=25)
+    if stage == "apply_gamma_correction":
+        from Image.contrast import apply_gamma_correction
+        return lambda image: apply_gamma_correction(image, gamma=1.5)
+    if stage == "equalize_histogram":
+        from Image.contrast import equalize_histogram
+        return equalize_histogram
+    if stage == "equalize_histogram_clahe":
+        from Image.contrast import equalize_histogram
+        return lambda image: equalize_histogram(image, method="clahe")
+    if stage.startswith("remove_noise_"):
+        from Image.noisehandling import remove_noise
+        method = stage[len("remove_noise_"):]
+        return lambda image: remove_noise(image, method=method)
+    if stage == "upscale_x2":
+        from Image.upscale import upscale_array, model_path_for_scale
+        return lambda image: upscale_array(image, model_path_for_scale(2))
+    if stage == "generate_depth_map":
+        from Image.depthandanaglyp import generate_depth_map
+        return lambda image: generate_depth_map(image, model_name=args.model, backend=args.depth_backend)
+    if stage.startswith("create_anaglyph_"):
+        from Image.depthandanaglyp import create_anaglyph
+        method = stage[len("create_anaglyph_"):]
+        # A DPT-sized depth map, so the stage is timed without the model
+        depth_map = cv2.cvtColor(synthetic_image(384, 384, seed=1), cv2.COLOR_BGR2GRAY)
+        return lambda image: create_anaglyph(image, depth_map, method=method)
+    if stage.startswith("video_anaglyph_"):
+        from VideoAndLive.videoprocessor import VideoProcessor
+        processor = VideoProcessor()
+        processor.precision = stage[len("video_anaglyph_"):]
+        return lambda image: processor.create_anaglyph(image)
+    raise ValueError(f"Unknown stage '{stage}'.")
+
+
+def video_stage(stage, args):
+    """Returns a function converting a video file to anaglyph 3D and writing to the given path."""
+    if stage == "process_video_to_3d":
+        from VideoAndLive.videoprocessor import VideoProcessor
+        return lambda video_path, output_path: VideoProcessor().process_video_to_3d(video_path, output_path)
+    if stage == "process_video_streaming":
+        from multithreading import VideoProcessor as MultiprocessingVideoProcessor
+        return lambda video_path, output_path: MultiprocessingVideoProcessor().process_video_streaming(
+            video_path, output_path, num_processes=args.processes)
+    raise ValueError(f"Unknown stage '{stage}'.")
+
+
+def summarize(timings, items, pixels):
+    """Latency statistics and throughput of one case."""
+    timings = sorted(timings)
+    median = statistics.median(timings)
+    return {
+        "runs": len(timings),
+        "median_ms": median * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))] * 1000,
+        "min_ms": timings[0] * 1000,
+        "items_per_second": items / median if median > 0 else None,
+        "megapixels_per_second": pixels / median / 1e6 if median > 0 else None,
+    }
+
+
+def time_call(func, repeats, warmup):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_stage(stage, args):
+    """Benchmarks one stage at the given resolutions (and on --video) in this process and returns its cases."""
+    cases = []
+    start = time.perf_counter()
+    if stage in IMAGE_STAGES:
+        func = image_stage(stage, args)
+        setup_seconds = time.perf_counter() - start
+        for resolution in args.resolutions:
+            width, height = parse_resolution(resolution)
+            for input_name, image in image_inputs(width, height, not args.synthetic_only):
+                timings = time_call(lambda: func(image), args.repeats, args.warmup)
+                cases.append(dict(stage=stage, resolution=resolution, input=input_name,
+                                  **summarize(timings, 1, width * height)))
+    else:
+        func = video_stage(stage, args)
+        setup_seconds = time.perf_counter() - start
+        with tempfile.TemporaryDirectory(prefix="stagebench-") as temp_dir:
+            output_path = os.path.join(temp_dir, "output.avi")
+            videos = []
+            for resolution in args.resolutions:
+                width, height = parse_resolution(resolution)
+                videos.append(("synthetic", resolution, synthetic_video(
+                    os.path.join(temp_dir, f"input_{resolution}.avi"), width, height, args.video_frames)))
+            if args.video:
+                capture = cv2.VideoCapture(args.video)
+                resolution = f"{int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}"
+                capture.release()
+                videos.append((os.path.basename(args.video), resolution, args.video))
+
+            for input_name, resolution, video_path in videos:
+                capture = cv2.VideoCapture(video_path)
+                frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+                capture.release()
+                width, height = parse_resolution(resolution)
+                # Whole-video runs are long, so they are repeated fewer times
+                timings = time_call(lambda: func(video_path, output_path), max(1, args.repeats // 3), 0)
+                cases.append(dict(stage=stage, resolution=resolution, input=input_name, frames=frames,
+                                  **summarize(timings, frames, frames * width * height)))
+
+    # The peak covers every case of this process, so main runs one process per stage and resolution
+    peak_mb = peak_rss_mb()
+    peak_children_mb = peak_rss_children_mb()
+    for case in cases:
+        case["setup_seconds"] = setup_seconds
+        case["peak_rss_mb"] = peak_mb
+        case["peak_rss_children_mb"] = peak_children_mb
+    return cases
+
+
+def environment():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+def compare(results, baseline_path, max_regression):
+    """Prints the cases whose median got slower than the baseline by more than max_regression."""
+    with open(baseline_path, "r", encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    previous = {(case["stage"], case["resolution"], case["input"]): case
+                for case in baseline["results"] if "median_ms" in case}
+
+    regressions = 0
+    for case in results:
+        old = previous.get((case["stage"], case["resolution"], case["input"]))
+        if old is None or "median_ms" not in case:
+            continue
+        change = case["median_ms"] / old["median_ms"] - 1
+        if change > max_regression:
+            regressions += 1
+            print(f"REGRESSION {case['stage']} {case['resolution']} {case['input']}: "
+                  f"{old['median_ms']:.1f} -> {case['median_ms']:.1f} ms ({change:+.0%})")
+    print("No regressions" if regressions == 0 else f"{regressions} regressions")
+    return regressions == 0
+
+
+def print_table(results):
+    print(f"{'Stage':<28} {'Resolution':>10} {'Input':<20} {'median ms':>10} {'p95 ms':>10} "
+          f"{'items/s':>9} {'peak MB':>8}")
+    for case in results:
+        if "error" in case:
+            print(f"{case['stage']:<28} {'':>10} {'':<20} error: {case['error']}")
+            continue
+        peak = f"{case['peak_rss_mb']:>8.0f}" if case.get("peak_rss_mb") is not None else f"{'-':>8}"
+        print(f"{case['stage']:<28} {case['resolution']:>10} {case['input'][:20]:<20} {case['median_ms']:>10.2f} "
+              f"{case['p95_ms']:>10.2f} {case['items_per_second']:>9.2f} {peak}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the image, depth, anaglyph and video stages.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--resolutions", nargs="*", default=["640x360", "1280x720", "1920x1080"],
+                        help="WIDTHxHEIGHT of the inputs.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case (model loading lands here).")
+    parser.add_argument("--synthetic-only", action="store_true", help="Skip the fixture images.")
+    parser.add_argument("--video", help="Also benchmark the video stages on this file.")
+    parser.add_argument("--video-frames", type=int, default=60, help="Frames of the synthetic videos.")
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes of process_video_streaming.")
+    parser.add_argument("--model", default=DEFAULT_DEPTH_MODEL, help="DPT model name or local path.")
+    parser.add_argument("--depth-backend", default="eager", help="Depth backend used by generate_depth_map.")
+    parser.add_argument("--output", help="Write the results as JSON to this path.")
+    parser.add_argument("--compare", help="JSON of an earlier run to compare the medians with.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative slowdown of a median before --compare fails.")
+    parser.add_argument("--single", choices=STAGES, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.single:
+        print(json.dumps(run_stage(args.single, args)))
+        return 0
+
+    # Each stage and resolution in a fresh interpreter, so a case neither pays for nor inherits the
+    # memory of another and its peak RSS is its own
+    forwarded = _without_options(argv, ("--stages", "--resolutions", "--video"))
+    results = []
+    for stage in args.stages:
+        runs = [["--resolutions", resolution] for resolution in args.resolutions]
+        if args.video and stage in VIDEO_STAGES:
+            runs.append(["--resolutions", "--video", args.video])
+        for run in runs:
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--single", stage]
+                                       + forwarded + run, cwd=APP_DIR, capture_output=True, text=True)
+            if completed.returncode != 0:
+                error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+                results.append({"stage": stage, "error": error})
+                continue
+            results.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print_table(results)
+    report = {"environment": environment(), "arguments": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    ok = all("error" not in case for case in results)
+    if args.compare:
+        ok = compare(results, args.compare, args.max_regression) and ok
+    return 0 if ok else 1
+
+
+def _without_options(argv, options):
+    """The command line without the given options and their values, to forward to the per-case runs."""
+    forwarded = []
+    skipping = False
+    for arg in argv:
+        if arg.split("=", 1)[0] in options:
+            skipping = "=" not in arg
+            continue
+        if skipping and not arg.startswith("--"):
+            continue
+        skipping = False
+        forwarded.append(arg)
+    return forwarded
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Libraries that must only be imported when a stage actually needs them
+HEAVY_MODULES = ("torch", "transformers", "skimage", "PIL")
+
+# Imports the same modules as try.py does before the main window is shown
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import imagePage, livePage, videoPage
+from Image.pipeline import start_prewarm_thread
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_startup(runs=5):
+    """Imports the GUI pages in fresh interpreters and returns the timings and any heavy modules loaded."""
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=APP_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded.update(result["loaded"])
+    return timings, sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long the GUI modules take to import.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=2.0, help="Maximum median import time in seconds.")
+    args = parser.parse_args(argv)
+
+    timings, loaded = measure_startup(args.runs)
+    median = statistics.median(timings)
+    print(json.dumps({"median_seconds": median, "max_seconds": max(timings), "heavy_modules_loaded": loaded}))
+
+    if loaded:
+        print(f"FAIL: startup imported {', '.join(loaded)}")
+        return 1
+    if median > args.budget:
+        print(f"FAIL: median startup import {median:.2f}s exceeds budget {args.budget:.2f}s")
+        return 1
+    print("Startup OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,15 @@
 import cv2
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool, QTimer
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGraphicsView, QGraphicsScene, \
-    QFileDialog, QDialog, QCheckBox, QGroupBox, QRadioButton, QMessageBox
-from Image.contrast import adjust_brightness_contrast, apply_gamma_correction, equalize_histogram, process_image
-from Image.depthandanaglyp import generate_depth_map, generate_anaglyph
-from Image.noisehandling import process_temp_image
-from Image.upscale import upscale_image
+    QFileDialog, QDialog, QCheckBox, QGroupBox, QRadioButton, QMessageBox, QSpinBox, QDoubleSpinBox
+from Image.pipeline import build_image_pipeline, DepthSession, ImagePipeline
+from Image.resultcache import image_result_cache
+from pipelineWorker import PipelineWorker
 from TempImageSaver import TempImageSaver
 
+# How long the 3D shift and gamma have to stay unchanged before the anaglyph is recomposed
+ANAGLYPH_UPDATE_DELAY_MS = 150
 
 class ImagePage(QWidget):
     def __init__(self):
@@ -91,6 +92,12 @@ class ImagePage(QWidget):
         start_button.setStyleSheet(self.get_button_stylesheet())
         bottom_layout.addWidget(start_button)
 
+        cancel_button = QPushButton("Cancel")
+        cancel_button.setFixedSize(100, 40)
+        cancel_button.clicked.connect(self.cancel_processing)
+        cancel_button.setStyleSheet(self.get_button_stylesheet())
+        bottom_layout.addWidget(cancel_button)
+
         save_button = QPushButton("Save")
         save_button.setFixedSize(100, 40)
         save_button.clicked.connect(self.save_output_image)
@@ -98,8 +105,55 @@ class ImagePage(QWidget):
         bottom_layout.addWidget(save_button)
 
         layout.addLayout(bottom_layout)
+
+        # Anaglyph settings; changing them only redoes the warp on the depth map of the last run.
+        # Spinbox steps restart a single-shot timer, so a burst of changes recomposes once
+        anaglyph_layout = QHBoxLayout()
+        self.anaglyph_timer = QTimer(self)
+        self.anaglyph_timer.setSingleShot(True)
+        self.anaglyph_timer.setInterval(ANAGLYPH_UPDATE_DELAY_MS)
+        self.anaglyph_timer.timeout.connect(self.update_anaglyph)
+        self.anaglyph_worker = None
+
+        shift_label = QLabel("3D Shift")
+        shift_label.setStyleSheet("color: black; font-size: 14px;")
+        anaglyph_layout.addWidget(shift_label)
+
+        self.shift_spinbox = QSpinBox()
+        self.shift_spinbox.setRange(0, 60)
+        self.shift_spinbox.setValue(15)
+        self.shift_spinbox.valueChanged.connect(lambda _: self.anaglyph_timer.start())
+        anaglyph_layout.addWidget(self.shift_spinbox)
+
+        gamma_label = QLabel("Gamma")
+        gamma_label.setStyleSheet("color: black; font-size: 14px;")
+        anaglyph_layout.addWidget(gamma_label)
+
+        self.gamma_spinbox = QDoubleSpinBox()
+        self.gamma_spinbox.setRange(0.2, 3.0)
+        self.gamma_spinbox.setSingleStep(0.1)
+        self.gamma_spinbox.setValue(1.2)
+        self.gamma_spinbox.valueChanged.connect(lambda _: self.anaglyph_timer.start())
+        anaglyph_layout.addWidget(self.gamma_spinbox)
+
+        layout.addLayout(anaglyph_layout)
+
+        self.status_label = QLabel("Idle")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setStyleSheet("color: black; font-size: 14px;")
+        layout.addWidget(self.status_label)
+
         self.setLayout(layout)
 
+        # Jobs run one after another on a worker thread so the GUI stays responsive
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.active_workers = []
+
+        # Depth map of the last finished run that had a depth stage
+        self.depth_session = None
+        self.set_anaglyph_controls_enabled(False)
+
     def open_file_dialog(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getOpenFileName(self, "Choose Image", "", "Images (*.png *.jpg *.jpeg *.bmp)",
@@ -114,6 +168,9 @@ class ImagePage(QWidget):
 
             # Store the OpenCV image and file path as instance variables
             self.selected_image = image
+            # The kept depth map belongs to the previous image
+            self.depth_session = None
+            self.set_anaglyph_controls_enabled(False)
             self.selected_image_path = file_path
 
             # Convert the OpenCV image (BGR) to a format suitable for PyQt (RGB)
@@ -135,7 +192,7 @@ class ImagePage(QWidget):
     def open_new_window(self):
         dialog = QDialog(self)
         dialog.setWindowTitle("Choose Processing Options")
-        dialog.setFixedSize(300, 400)
+        dialog.setFixedSize(300, 460)
 
         # Set semi-transparent background
         dialog.setWindowFlags(Qt.FramelessWindowHint | Qt.Dialog)
@@ -167,6 +224,10 @@ class ImagePage(QWidget):
         contrast_option = QCheckBox("Adjust Contrast")
         layout.addWidget(contrast_option)
 
+        adaptive_contrast_option = QCheckBox("Adaptive Contrast (CLAHE)")
+        adaptive_contrast_option.setToolTip("Equalize in tiles; better on high dynamic range shots.")
+        layout.addWidget(adaptive_contrast_option)
+
         noise_option = QCheckBox("Noise Removal")
         layout.addWidget(noise_option)
 
@@ -189,12 +250,18 @@ class ImagePage(QWidget):
         depth_option = QCheckBox("Depth Map and Anaglyph")
         layout.addWidget(depth_option)
 
+        fast_depth_option = QCheckBox("Fast Depth (int8)")
+        fast_depth_option.setToolTip("Quantized depth model: faster on CPU, slightly less accurate depth.")
+        layout.addWidget(fast_depth_option)
+
         apply_button = QPushButton("Apply")
         apply_button.clicked.connect(lambda: self.set_processing(dialog, {
             "contrast": contrast_option.isChecked(),
+            "adaptive_contrast": adaptive_contrast_option.isChecked(),
             "noise": noise_option.isChecked(),
             "upscale": 2 if upscale_x2.isChecked() else 4 if upscale_x4.isChecked() else 8 if upscale_x8.isChecked() else None,
-            "depth": depth_option.isChecked()
+            "depth": depth_option.isChecked(),
+            "fast_depth": fast_depth_option.isChecked()
         }))
         layout.addWidget(apply_button)
 
@@ -220,6 +287,8 @@ class ImagePage(QWidget):
             selected_techniques.append("Depth Map and Anaglyph")
 
         self.selected_process["techniques"] = selected_techniques
+        self.selected_process["depth_backend"] = "int8" if form_data["fast_depth"] else None
+        self.selected_process["contrast_equalization"] = "clahe" if form_data["adaptive_contrast"] else "global"
 
         dialog.accept()
 
@@ -228,135 +297,131 @@ class ImagePage(QWidget):
         """if not hasattr(self, 'selected_process') or not self.selected_process:
             return  # No process selected"""
 
-        self.temp_path = TempImageSaver.save_temp_image(self.selected_image)
         # Retrieve selected process data
         selected_techniques = self.selected_process.get("techniques", [])
 
-        # Check and process each technique individually
-        if "Adjust Contrast" in selected_techniques:
-            print("Processing: Adjust Contrast")
-            self.adjust_contrast()
-
-        if "Noise Removal" in selected_techniques:
-            print("Processing: Noise Removal")
-            self.remove_noise()
+        # Stages hand numpy arrays to each other in memory; nothing is written until the user saves.
+        # Outputs are cached, so resubmitting with one option changed only reruns the later stages.
+        depth_session = DepthSession(shift=self.shift_spinbox.value(), gamma=self.gamma_spinbox.value())
+        pipeline = build_image_pipeline(selected_techniques, cache=image_result_cache, depth_session=depth_session,
+                                        depth_backend=self.selected_process.get("depth_backend"),
+                                        contrast_equalization=self.selected_process.get("contrast_equalization",
+                                                                                        "global"))
+        worker = PipelineWorker(pipeline, self.selected_image.copy())
+        worker.depth_session = depth_session
+        worker.signals.stage_started.connect(self.on_stage_started)
+        worker.signals.stage_finished.connect(self.on_stage_done)
+        worker.signals.stage_failed.connect(self.on_stage_error)
+        worker.signals.finished.connect(lambda image: self.on_processing_finished(worker, image))
+        worker.signals.cancelled.connect(lambda: self.on_processing_cancelled(worker))
+        worker.signals.error.connect(lambda message: self.on_processing_failed(worker, message))
+
+        self.active_workers.append(worker)
+        self.status_label.setText("Queued")
+        self.thread_pool.start(worker)
+
+    def cancel_processing(self):
+        """
+        Cancel the running job and any queued ones; each stops before its next stage.
+        """
+        for worker in self.active_workers:
+            worker.cancel()
 
-        upscale_technique = next((technique for technique in selected_techniques if technique.startswith("Upscale x")),
-                                 None)
-        if upscale_technique:
-            upscale_factor = int(upscale_technique.split("x")[1])
-            print(f"Processing: Upscale x{upscale_factor}")
-            self.upscale_image(upscale_factor)
+    def on_stage_started(self, stage_name, index, total):
+        print(f"Processing: {stage_name}")
+        self.status_label.setText(f"Processing: {stage_name} ({index + 1}/{total})")
 
-        if "Depth Map and Anaglyph" in selected_techniques:
-            print("Processing: Depth Map and Anaglyph")
-            self.generate_depth_map_and_anaglyph()
+    def on_processing_finished(self, worker, image):
+        self._release_worker(worker)
+        self.output_image = image
+        self.status_label.setText("Done")
+        self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(image)))
 
-        generated_image = cv2.imread(self.temp_path)
-        self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(generated_image)))
+        if worker.depth_session.has_depth():
+            self.depth_session = worker.depth_session
+            self.set_anaglyph_controls_enabled(True)
 
+    def set_anaglyph_controls_enabled(self, enabled):
+        self.shift_spinbox.setEnabled(enabled)
+        self.gamma_spinbox.setEnabled(enabled)
 
-    def adjust_contrast(self):
+    def update_anaglyph(self):
         """
-        Adjust Contrast
+        Rebuild the anaglyph with the current shift and gamma from the kept depth map.
+
+        The warp runs on the worker thread like a processing job; an update still waiting in the
+        queue is cancelled, since only the latest settings matter.
         """
-        if not hasattr(self, 'temp_path') or self.temp_path is None:
-            print("No valid temporary path found.")
+        if self.depth_session is None:
             return
-        try:
-            adjusted_image = process_image(self.temp_path)
-            self.temp_path = TempImageSaver.save_temp_image(adjusted_image)
-            print(f"Depth map and anaglyph image generated and saved temporarily at {self.temp_path}.")
-            self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(adjusted_image)))
-        except Exception as e:
-            # Display the error using a message box
-            error_message = QMessageBox()
-            error_message.setIcon(QMessageBox.Critical)
-            error_message.setWindowTitle("Error")
-            error_message.setText("An error occurred during depth map and anaglyph generation.")
-            error_message.setInformativeText(str(e))
-            error_message.exec_()
-
-
-
-    def generate_depth_map_and_anaglyph(self):
-        """
-        Generate a depth map and an anaglyph image from the selected image.
-        """
-        if not hasattr(self, 'temp_path') or self.temp_path is None:
-            print("No valid temporary path found.")
+        if self.anaglyph_worker is not None:
+            self.anaglyph_worker.cancel()
+
+        depth_session = self.depth_session
+        shift, gamma = self.shift_spinbox.value(), self.gamma_spinbox.value()
+
+        def recompose(_):
+            return depth_session.anaglyph(shift=shift, gamma=gamma)
+
+        pipeline = ImagePipeline().add_stage("Depth Map and Anaglyph", recompose)
+        worker = PipelineWorker(pipeline, None)
+        worker.depth_session = depth_session
+        worker.signals.stage_failed.connect(self.on_stage_error)
+        worker.signals.finished.connect(lambda image: self.on_anaglyph_updated(worker, image))
+        worker.signals.cancelled.connect(lambda: self._release_worker(worker))
+        worker.signals.error.connect(lambda message: self.on_processing_failed(worker, message))
+
+        self.anaglyph_worker = worker
+        self.active_workers.append(worker)
+        self.thread_pool.start(worker)
+
+    def on_anaglyph_updated(self, worker, image):
+        self._release_worker(worker)
+        if worker is self.anaglyph_worker:
+            self.anaglyph_worker = None
+        # Skip results of a failed warp or of a depth map that has been replaced meanwhile
+        if image is None or worker.depth_session is not self.depth_session:
             return
-        try:
-            depth_map = generate_depth_map(self.temp_path)
-            anaglyph_image = generate_anaglyph(self.temp_path, depth_map)
-            self.temp_path = TempImageSaver.save_temp_image(anaglyph_image)
-            print(f"Depth map and anaglyph image generated and saved temporarily at {self.temp_path}.")
-            self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(anaglyph_image)))
-            #self.display_output_image(QPixmap.fromImage(QImage(anaglyph_image)))
-        except Exception as e:
-            # Display the error using a message box
-            error_message = QMessageBox()
-            error_message.setIcon(QMessageBox.Critical)
-            error_message.setWindowTitle("Error")
-            error_message.setText("An error occurred during depth map and anaglyph generation.")
-            error_message.setInformativeText(str(e))
-            error_message.exec_()
-
-    def remove_noise(self):
+        self.output_image = image
+        self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(image)))
+
+    def on_processing_cancelled(self, worker):
+        self._release_worker(worker)
+        self.status_label.setText("Cancelled")
+
+    def on_processing_failed(self, worker, message):
+        self._release_worker(worker)
+        self.status_label.setText("Failed")
+        self.on_stage_error("Processing", message)
+
+    def _release_worker(self, worker):
+        if worker in self.active_workers:
+            self.active_workers.remove(worker)
+
+    def on_stage_done(self, stage_name, image):
         """
-        Remove noise from the selected image path and save the result temporarily.
+        Show the intermediate result of a finished stage.
         """
-        if not hasattr(self, 'temp_path') or self.temp_path is None:
-            print("No valid image loaded or temp path not found.")
-            return
+        print(f"Processing: {stage_name} done.")
+        self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(image)))
 
-        try:
-            denoised_image = process_temp_image(self.temp_path)
-            # Save the denoised image temporarily
-            self.temp_path = TempImageSaver.save_temp_image(denoised_image)
-            print(f"Noise removal applied and saved temporarily at {self.temp_path}.")
-            self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(denoised_image)))
-        except Exception as e:
-            # Display the error using a message box
-            error_message = QMessageBox()
-            error_message.setIcon(QMessageBox.Critical)
-            error_message.setWindowTitle("Error")
-            error_message.setText("An error occurred during noise removal.")
-            error_message.setInformativeText(str(e))
-            error_message.exec_()
-
-    def upscale_image(self, factor):
+    def on_stage_error(self, stage_name, error):
         """
-        Upscale an image using a specified factor and save the result temporarily.
-
-        Args:
-            factor (int): The upscale factor (2, 4, or 8).
+        Display the error of a failed stage using a message box.
         """
-        model_map = {
-            2: "LapSRN_x2.pb",
-            4: "LapSRN_x4.pb",
-            8: "LapSRN_x8.pb"
+        error_texts = {
+            "Adjust Contrast": "An error occurred during contrast adjustment.",
+            "Noise Removal": "An error occurred during noise removal.",
+            "Depth Map and Anaglyph": "An error occurred during depth map and anaglyph generation.",
         }
-
-        model_path = "Image/" + model_map.get(factor)
-        if not model_path:
-            print("Error: Invalid upscale factor.")
-            return
-
-        try:
-            upscaled_image = upscale_image(self.selected_image_path, model_path)
-            # Save the upscaled image temporarily
-            self.temp_path = TempImageSaver.save_temp_image(upscaled_image)
-            self.display_output_image(QPixmap.fromImage(TempImageSaver.convert_cv_to_qimage(upscaled_image)))
-            print(f"Upscaled image (x{factor}) applied and saved temporarily at {self.temp_path}.")
-        except Exception as e:
-            # Display the error using a message box
-            error_message = QMessageBox()
-            error_message.setIcon(QMessageBox.Critical)
-            error_message.setWindowTitle("Error")
-            error_message.setText("An error occurred during upscaling.")
-            error_message.setInformativeText(str(e))
-            error_message.exec_()
+        error_message = QMessageBox()
+        error_message.setIcon(QMessageBox.Critical)
+        error_message.setWindowTitle("Error")
+        default_text = "An error occurred during upscaling." if stage_name.startswith("Upscale x") \
+            else "An error occurred during processing."
+        error_message.setText(error_texts.get(stage_name, default_text))
+        error_message.setInformativeText(str(error))
+        error_message.exec_()
 
     def display_output_image(self, pixmap):
         self.output_graphics_scene.clear()
@@ -367,6 +432,10 @@ class ImagePage(QWidget):
         options = QFileDialog.Options()
         save_path, _ = QFileDialog.getSaveFileName(self, "Save Image", "", "Images (*.png *.jpg *.jpeg *.bmp)", options=options)
         if save_path:
+            if getattr(self, 'output_image', None) is not None:
+                # Save the full resolution result rather than the displayed pixmap
+                cv2.imwrite(save_path, self.output_image)
+                return
             items = self.output_graphics_scene.items()
             if items:
                 pixmap_item = items[0]  # Assuming one item in the scene
@@ -0,0 +1,224 @@
+"""
+Lightweight timing and memory spans for the image, video and live paths.
+
+Instrumentation is off by default and then costs one flag check per span. Enable it with
+enable() or the APP_INSTRUMENTATION environment variable ("1" for timings, "alloc" to also
+track Python/NumPy allocations with tracemalloc). If APP_INSTRUMENTATION_DUMP names a file,
+the registry is written there at exit (Prometheus text for a .prom file, JSON otherwise).
+
+Example:
+    with span("image.stage.Noise Removal"):
+        ...
+
+    @instrumented("video.create_anaglyph")
+    def create_anaglyph(self, frame):
+        ...
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+_enabled = False
+_track_allocations = False
+
+
+class SpanStats:
+    """Totals of one span name plus a rolling window of its most recent wall times."""
+
+    def __init__(self, window):
+        self.count = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.max_wall_seconds = 0.0
+        self.allocated_bytes = 0
+        self.recent = deque(maxlen=window)
+
+    def add(self, wall, cpu, allocated):
+        self.count += 1
+        self.wall_seconds += wall
+        self.cpu_seconds += cpu
+        self.max_wall_seconds = max(self.max_wall_seconds, wall)
+        self.allocated_bytes += allocated
+        self.recent.append(wall)
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "max_wall_seconds": self.max_wall_seconds,
+            "p50_wall_seconds": self.quantile(0.5),
+            "p95_wall_seconds": self.quantile(0.95),
+            "allocated_bytes": self.allocated_bytes,
+        }
+
+
+class SpanRegistry:
+    """Thread-safe, in-process collection of span statistics keyed by span name."""
+
+    def __init__(self, window=256):
+        self.window = window
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, wall, cpu, allocated=0):
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = SpanStats(self.window)
+            stats.add(wall, cpu, allocated)
+
+    def snapshot(self):
+        """Returns {span name: statistics dict}."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._spans.items())}
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+
+    def to_json(self):
+        return json.dumps({"spans": self.snapshot()}, indent=2)
+
+    def to_prometheus(self, prefix="app_span"):
+        """Renders the registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_wall_seconds Wall time of instrumented spans.",
+            f"# TYPE {prefix}_wall_seconds summary",
+        ]
+        for name, stats in snapshot.items():
+            label = _prometheus_label(name)
+            lines.append(f'{prefix}_wall_seconds{{span="{label}",quantile="0.5"}} {stats["p50_wall_seconds"]:.9f}')
+            lines.append(f'{prefix}_wall_seconds{{span="{label}",quantile="0.95"}} {stats["p95_wall_seconds"]:.9f}')
+            lines.append(f'{prefix}_wall_seconds_sum{{span="{label}"}} {stats["wall_seconds"]:.9f}')
+            lines.append(f'{prefix}_wall_seconds_count{{span="{label}"}} {stats["count"]}')
+        for metric, key, help_text in (
+                ("cpu_seconds_total", "cpu_seconds", "CPU time of the calling thread inside spans."),
+                ("allocated_bytes_total", "allocated_bytes", "Net Python/NumPy allocations inside spans."),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for name, stats in snapshot.items():
+                lines.append(f'{prefix}_{metric}{{span="{_prometheus_label(name)}"}} {stats[key]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Writes the registry to path, as Prometheus text for .prom files and JSON otherwise."""
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, "w", encoding="utf-8") as dump_file:
+            dump_file.write(text)
+
+
+def _prometheus_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Shared registry all spans report to
+registry = SpanRegistry()
+
+
+def enable(track_allocations=False):
+    """Start recording spans; track_allocations also measures allocation deltas (slower)."""
+    global _enabled, _track_allocations
+    _track_allocations = track_allocations
+    if track_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class _Span:
+    __slots__ = ("name", "wall_start", "cpu_start", "memory_start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.memory_start = tracemalloc.get_traced_memory()[0] if _track_allocations else 0
+        self.cpu_start = time.thread_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.thread_time() - self.cpu_start
+        allocated = tracemalloc.get_traced_memory()[0] - self.memory_start if _track_allocations else 0
+        registry.record(self.name, wall, cpu, allocated)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """
+    Context manager recording the wall time, thread CPU time and allocations of its block.
+
+    Args:
+        name (str): Span name, e.g. "image.stage.Upscale x2".
+
+    Returns:
+        A context manager; a shared no-op one while instrumentation is disabled.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def instrumented(name=None):
+    """Decorator recording every call of the function as a span (named after the function by default)."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _configure_from_environment():
+    mode = os.environ.get("APP_INSTRUMENTATION", "").strip().lower()
+    if mode in ("1", "true", "on", "alloc"):
+        enable(track_allocations=mode == "alloc")
+    dump_path = os.environ.get("APP_INSTRUMENTATION_DUMP")
+    if dump_path:
+        atexit.register(registry.dump, dump_path)
+
+
+_configure_from_environment()
@@ -2,18 +2,30 @@ import cv2
 import numpy as np
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGraphicsView, QGraphicsScene
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGraphicsView, QGraphicsScene, \
+    QMessageBox
 from numpy.core.defchararray import upper
 
+from VideoAndLive.capture import LatestFrameCapture
+from VideoAndLive.pacing import FramePacer
 from VideoAndLive.videoprocessor import VideoProcessor
+from instrumentation import span
+
+# How long to wait before checking again when the camera has no new frame
+NEW_FRAME_POLL_MS = 5
 
 class LivePage(QWidget):
     def __init__(self):
         super().__init__()
         self.video_processor = VideoProcessor()
+        # Single-shot timer re-armed after every frame with the delay chosen by the pacer
         self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.update_frame)
-        self.capture = cv2.VideoCapture(0)
+        self.pacer = None
+        # Camera I/O runs on its own thread; the timer only picks up the freshest frame
+        self.capture = LatestFrameCapture(0)
+        self.output_buffer = None
 
         layout = QVBoxLayout()
 
@@ -46,6 +58,11 @@ class LivePage(QWidget):
 
         layout.addLayout(upper_layout)
 
+        self.stats_label = QLabel("Captured: 0 | Processed: 0 | Dropped: 0")
+        self.stats_label.setAlignment(Qt.AlignCenter)
+        self.stats_label.setStyleSheet("color: black; font-size: 14px;")
+        layout.addWidget(self.stats_label)
+
         # Bottom part with buttons
         bottom_layout = QHBoxLayout()
 
@@ -64,33 +81,55 @@ class LivePage(QWidget):
         self.setLayout(layout)
 
     def start_live_feed(self):
-        if not self.capture.isOpened():
-            self.capture.open(0)
-        self.timer.start(30)  # Update frame every 30 ms
+        try:
+            self.capture.start()
+        except ValueError as e:
+            # An exception escaping a Qt slot aborts the application
+            QMessageBox.warning(self, "Camera Unavailable", str(e))
+            return
+        self.pacer = FramePacer(self.capture.frame_rate())
+        self.pacer.start()
+        self.timer.start(0)
 
     def stop_live_feed(self):
         self.timer.stop()
-        if self.capture.isOpened():
-            self.capture.release()
+        self.capture.stop()
 
     def update_frame(self):
-        ret, frame = self.capture.read()
-        if not ret:
+        frame = self.capture.read_latest()
+        if frame is None:
+            # No new frame yet; poll again shortly without advancing the schedule
+            if self.capture.is_running():
+                self.timer.start(NEW_FRAME_POLL_MS)
             return
+        self.pacer.frame_started()
 
         # Display the original frame
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with span("live.display"):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            self.display_frame(self.input_graphics_scene, frame_rgb)
+
+        # Process the frame using process_live_to_3d, reusing the output buffer between frames
+        if self.output_buffer is None or self.output_buffer.shape != frame.shape:
+            self.output_buffer = np.empty_like(frame)
+        with span("live.process"):
+            processed_frame = self.video_processor.process_live_to_3d(frame, out=self.output_buffer)
 
-        self.display_frame(self.input_graphics_scene, frame_rgb)
+        with span("live.display"):
+            # Convert the processed frame to RGB
+            processed_frame_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
 
-        # Process the frame using process_live_to_3d
-        processed_frame = self.video_processor.process_live_to_3d(frame)
+            # Display the processed frame
+            self.display_frame(self.output_graphics_scene, processed_frame_rgb)
 
-        # Convert the processed frame to RGB
-        processed_frame_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+        self.capture.mark_processed()
+        stats = self.capture.stats()
+        self.stats_label.setText(
+            f"Captured: {stats['captured']} | Processed: {stats['processed']} | Dropped: {stats['dropped']}")
 
-        # Display the processed frame
-        self.display_frame(self.output_graphics_scene, processed_frame_rgb)
+        self.pacer.frame_finished()
+        self.timer.start(self.pacer.next_delay_ms())
 
     def display_frame(self, scene, frame):
         height, width, channels = frame.shape
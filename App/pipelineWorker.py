@@ -0,0 +1,53 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from Image.pipeline import PipelineCancelled
+
+
+class PipelineWorkerSignals(QObject):
+    """
+    Signals emitted by a PipelineWorker. They are delivered to the GUI thread through queued connections.
+    """
+    stage_started = pyqtSignal(str, int, int)   # stage name, stage index, number of stages
+    stage_finished = pyqtSignal(str, object)    # stage name, stage output image
+    stage_failed = pyqtSignal(str, str)         # stage name, error message
+    finished = pyqtSignal(object)               # final image
+    cancelled = pyqtSignal()
+    error = pyqtSignal(str)
+
+
+class PipelineWorker(QRunnable):
+    """
+    Runs an ImagePipeline on a QThreadPool thread so the Qt event loop keeps running.
+    """
+
+    def __init__(self, pipeline, image):
+        super().__init__()
+        self.pipeline = pipeline
+        self.image = image
+        self.signals = PipelineWorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """Request cancellation; the pipeline stops before its next stage."""
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            result = self.pipeline.run(
+                self.image,
+                on_stage_start=self.signals.stage_started.emit,
+                on_stage_done=self.signals.stage_finished.emit,
+                on_stage_error=lambda name, e: self.signals.stage_failed.emit(name, str(e)),
+                should_cancel=self.is_cancelled,
+            )
+        except PipelineCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
@@ -19,8 +19,9 @@ from PyQt5.QtWidgets import (
     QButtonGroup,
     QSizePolicy, QCheckBox, QGroupBox,
 )
-from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtCore import Qt, QUrl, QTimer
 from PyQt5.QtGui import QPixmap, QImage, QDesktopServices
+from Image.pipeline import start_prewarm_thread
 from imagePage import ImagePage
 from livePage import LivePage
 from videoPage import VideoPage
@@ -229,4 +230,9 @@ if __name__ == "__main__":
     window.setAttribute(Qt.WA_NoSystemBackground, True)
     window.setAttribute(Qt.WA_TranslucentBackground, True)
     window.show()
+
+    # Load torch/transformers/scikit-image in the background once the window is up
+    if "--no-prewarm" not in sys.argv:
+        QTimer.singleShot(0, start_prewarm_thread)
+
     sys.exit(app.exec_())
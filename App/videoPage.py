@@ -2,16 +2,21 @@ import cv2
 import numpy as np
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGraphicsView, QGraphicsScene, QFileDialog, QMessageBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QGraphicsView, QGraphicsScene, QFileDialog, QMessageBox, QCheckBox
+from VideoAndLive.pacing import FramePacer
 from VideoAndLive.videoprocessor import VideoProcessor
+from instrumentation import span
 
 
 class VideoPage(QWidget):
     def __init__(self):
         super().__init__()
         self.video_processor = VideoProcessor()
+        # Single-shot timer re-armed after every frame with the delay chosen by the pacer
         self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.update_frame)
+        self.pacer = None
         self.capture = None
         self.video_writer = None
 
@@ -96,6 +101,10 @@ class VideoPage(QWidget):
         self.start_button.setStyleSheet(self.get_button_stylesheet())
         bottom_layout.addWidget(self.start_button)
 
+        self.fast_export_checkbox = QCheckBox("Export as fast as possible")
+        self.fast_export_checkbox.setChecked(True)
+        bottom_layout.addWidget(self.fast_export_checkbox)
+
         self.stop_button = QPushButton("Stop Processing")
         self.stop_button.setFixedSize(150, 40)
         self.stop_button.clicked.connect(self.stop_processing)
@@ -145,13 +154,17 @@ class VideoPage(QWidget):
             fourcc = cv2.VideoWriter_fourcc(*'XVID')
             self.video_writer = cv2.VideoWriter(self.output_video_path, fourcc, frame_rate, (frame_width, frame_height))
 
-            self.timer.start(30)  # Update frame every 30 ms
+            # Offline export runs flat out; otherwise playback follows the source frame rate
+            self.pacer = FramePacer(frame_rate, offline=self.fast_export_checkbox.isChecked())
+            self.pacer.start()
+            self.timer.start(0)
         else:
             QMessageBox.warning(self, "No Video Selected", "Please select a video file to process.")
 
 
     def stop_processing(self):
         self.timer.stop()
+        self.frame_count_label.setText(f"Frame: {self.current_frame} / {self.total_frames}")
         if self.capture:
             self.capture.release()
             self.capture = None
@@ -164,28 +177,36 @@ class VideoPage(QWidget):
         if not self.capture:
             return
 
-        ret, frame = self.capture.read()
+        with span("video.capture"):
+            ret, frame = self.capture.read()
         if not ret:
             self.stop_processing()
             return
 
         self.current_frame += 1
-
-        # Update the frame count label
-        self.frame_count_label.setText(f"Frame: {self.current_frame} / {self.total_frames}")
-
-        # Display the original frame
-        self.display_frame(self.input_graphics_scene, frame)
+        self.pacer.frame_started()
 
         # Process the frame using the VideoProcessor
-        processed_frame = self.video_processor.process_live_to_3d(frame)
+        with span("video.process"):
+            processed_frame = self.video_processor.process_live_to_3d(frame)
 
         # Write the processed frame to the output video
         if self.video_writer:
-            self.video_writer.write(processed_frame)
+            with span("video.encode"):
+                self.video_writer.write(processed_frame)
+
+        # Painting is skipped when behind schedule; every frame is still encoded
+        if self.pacer.should_display():
+            # Update the frame count label
+            self.frame_count_label.setText(f"Frame: {self.current_frame} / {self.total_frames}")
+
+            # Display the original and processed frames
+            with span("video.display"):
+                self.display_frame(self.input_graphics_scene, frame)
+                self.display_frame(self.output_graphics_scene, processed_frame)
 
-        # Display the processed frame
-        self.display_frame(self.output_graphics_scene, processed_frame)
+        self.pacer.frame_finished()
+        self.timer.start(self.pacer.next_delay_ms())
 
     def display_frame(self, scene, frame):
         height, width, channels = frame.shape